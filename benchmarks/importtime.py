@@ -0,0 +1,83 @@
+"""Measure the time it takes to import term.
+
+Usage: python benchmarks/importtime.py [-n RUNS] [--rev REV]
+
+Runs ``python -X importtime -c 'import term'`` in fresh interpreters
+and prints the median cumulative import time in microseconds as JSON.
+With --rev, the same measurement is taken for a git revision and both
+results are reported.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime(path, runs):
+    """Return sorted cumulative import times of term found at path."""
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = path
+    cache = tempfile.mkdtemp()
+    cmd = [sys.executable, '-X', 'pycache_prefix=' + cache,
+           '-X', 'importtime', '-c', 'import term']
+    try:
+        # Warm up the bytecode cache
+        subprocess.check_output(cmd, env=env, cwd=path, stderr=subprocess.STDOUT)
+        times = []
+        for _ in range(runs):
+            out = subprocess.check_output(cmd, env=env, cwd=path,
+                                          stderr=subprocess.STDOUT)
+            for line in out.decode().splitlines():
+                fields = [x.strip() for x in line.split('|')]
+                if len(fields) == 3 and fields[2] == 'term':
+                    times.append(int(fields[1]))
+        return sorted(times)
+    finally:
+        shutil.rmtree(cache)
+
+
+def checkout(rev):
+    """Export the term package at rev into a temporary directory."""
+    tmp = tempfile.mkdtemp()
+    archive = subprocess.check_output(['git', 'archive', rev, 'term'], cwd=ROOT)
+    subprocess.run(['tar', '-x', '-C', tmp], input=archive, check=True)
+    return tmp
+
+
+def report(times):
+    return {
+        'runs': len(times),
+        'median_us': times[len(times) // 2],
+        'min_us': times[0],
+        'max_us': times[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure import time of term.')
+    parser.add_argument('-n', '--runs', type=int, default=20)
+    parser.add_argument('--rev', help='git revision to compare against')
+    args = parser.parse_args()
+
+    result = {'python': sys.version.split()[0],
+              'current': report(importtime(ROOT, args.runs))}
+    if args.rev:
+        tmp = checkout(args.rev)
+        try:
+            result[args.rev] = report(importtime(tmp, args.runs))
+        finally:
+            shutil.rmtree(tmp)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""Benchmark term queries against a pty-backed stand-in terminal.
+
+Usage: python benchmarks/queries.py [-n CALLS] [--profile NAME ...] [-o FILE]
+
+Runs getyx, getfgcolor, getbgcolor, islightmode, getnumcolors, and
+query against a FakeTerminal running in a child process, and readto
+and iterrecords against in-memory streams. Reports wall time percentiles, bytes moved,
+and system calls per call as JSON.
+
+Read and write system calls and bytes are taken from /proc/self/io
+(Linux only; reported as null elsewhere). termios calls and opens are
+counted by wrapping the functions term uses.
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import argparse
+
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import term # pylint: disable=wrong-import-position
+from term.testing import FakeTerminal # pylint: disable=wrong-import-position
+
+# name -> (latency, jitter) in seconds
+PROFILES = {
+    'local': (0, 0),
+    'lan': (0.001, 0.0005),
+    'ssh': (0.02, 0.005),
+}
+
+
+class Counters(object):
+    """Count termios calls and opens made by term."""
+
+    def __init__(self):
+        self.termios = 0
+        self.opens = 0
+        self._saved = {}
+
+    def _wrap(self, module, name, attr):
+        func = getattr(module, name)
+        self._saved[(module, name)] = func
+
+        def wrapper(*args, **kw):
+            setattr(self, attr, getattr(self, attr) + 1)
+            return func(*args, **kw)
+        setattr(module, name, wrapper)
+
+    def __enter__(self):
+        for name in ('tcgetattr', 'tcsetattr'):
+            self._wrap(term, name, 'termios')
+        self._wrap(os, 'open', 'opens')
+        return self
+
+    def __exit__(self, *ignored):
+        for (module, name), func in self._saved.items():
+            setattr(module, name, func)
+
+
+def procio():
+    """Return read/write syscall and byte counters of this process."""
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            fields = dict(line.split(b': ') for line in f.read().splitlines())
+        return dict((k.decode(), int(v)) for k, v in fields.items())
+    except EnvironmentError:
+        return None
+
+
+def procio_overhead():
+    """Return the counters added by reading /proc/self/io."""
+    before = procio()
+    after = procio()
+    if before and after:
+        return dict((k, after[k] - before[k]) for k in after)
+    return None
+
+
+def spawn(latency, jitter):
+    """Run a FakeTerminal in a child process.
+
+    Returns (pid, device, control fd). Close the control fd to stop
+    the child.
+    """
+    r, w = os.pipe()
+    cr, cw = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        os.close(cw)
+        ft = FakeTerminal(yx=(10, 5), latency=latency, jitter=jitter)
+        ft.start()
+        os.write(w, ft.device.encode() + b'\n')
+        os.read(cr, 1)
+        ft.stop()
+        os._exit(0) # pylint: disable=protected-access
+    os.close(w)
+    os.close(cr)
+    device = b''
+    while not device.endswith(b'\n'):
+        device += os.read(r, 1024)
+    os.close(r)
+    return pid, device.decode().strip(), cw
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def measure(func, calls):
+    """Call func repeatedly and return statistics per call."""
+    func() # warm up
+    times = []
+    overhead = procio_overhead()
+    before = procio()
+    with Counters() as counters:
+        for _ in range(calls):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    after = procio()
+    times.sort()
+    result = {
+        'calls': calls,
+        'mean_ms': sum(times) / calls * 1000,
+        'p50_ms': percentile(times, 0.50) * 1000,
+        'p90_ms': percentile(times, 0.90) * 1000,
+        'p99_ms': percentile(times, 0.99) * 1000,
+        'max_ms': times[-1] * 1000,
+        'termios_calls': counters.termios / float(calls),
+        'opens': counters.opens / float(calls),
+        'read_calls': None,
+        'write_calls': None,
+        'bytes_read': None,
+        'bytes_written': None,
+    }
+    if before and after and overhead:
+        def perc(key):
+            return (after[key] - before[key] - overhead[key]) / float(calls)
+        result['read_calls'] = perc('syscr')
+        result['write_calls'] = perc('syscw')
+        result['bytes_read'] = perc('rchar')
+        result['bytes_written'] = perc('wchar')
+    return result
+
+
+QUERIES = {
+    'getyx': term.getyx,
+    'getfgcolor': term.getfgcolor,
+    'getbgcolor': term.getbgcolor,
+    'islightmode': term.islightmode,
+    'getnumcolors': term.getnumcolors,
+    'query': lambda: term.query('yx', 'fgcolor', 'bgcolor'),
+}
+
+
+def bench_queries(profile, calls):
+    latency, jitter = PROFILES[profile]
+    pid, device, control = spawn(latency, jitter)
+    saved = term.opentty.device
+    term.opentty.device = device
+    try:
+        return dict((name, measure(func, calls))
+                    for name, func in sorted(QUERIES.items()))
+    finally:
+        term.opentty.device = saved
+        os.close(control)
+        os.waitpid(pid, 0)
+
+
+def bench_readto(calls):
+    """Measure readto over in-memory streams."""
+    results = {}
+    for size in (16, 1024, 65536):
+        data = b'\033]52;c;' + b'x' * size + b'\007'
+
+        def func(data=data):
+            term.readto(BytesIO(data), b'\007')
+
+        result = measure(func, calls)
+        result['record_bytes'] = len(data)
+        result['mb_per_s'] = len(data) / (result['mean_ms'] / 1000) / 1e6
+        results['readto_%d' % size] = result
+    return results
+
+
+def bench_iterrecords(calls):
+    """Measure iterrecords splitting a stream of OSC replies."""
+    record = b'\033]11;rgb:ffff/ffff/ffff\033\\\033]10;rgb:0000/0000/0000\007'
+    data = record * 50000
+
+    def func():
+        for _ in term.iterrecords(BytesIO(data), (b'\007', b'\033\\')):
+            pass
+
+    result = measure(func, max(calls // 10, 1))
+    result['stream_bytes'] = len(data)
+    result['mb_per_s'] = len(data) / (result['mean_ms'] / 1000) / 1e6
+    return {'iterrecords': result}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark term queries.')
+    parser.add_argument('-n', '--calls', type=int, default=100)
+    parser.add_argument('--profile', action='append', choices=sorted(PROFILES))
+    parser.add_argument('-o', '--output', help='write JSON to file')
+    args = parser.parse_args()
+
+    result = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'term': term.__file__,
+        'profiles': {},
+    }
+    for profile in args.profile or ['local', 'ssh']:
+        result['profiles'][profile] = bench_queries(profile, args.calls)
+    result['readto'] = bench_readto(args.calls)
+    result['readto'].update(bench_iterrecords(args.calls))
+
+    out = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'wt') as f:
+            f.write(out + '\n')
+    else:
+        print(out)
+
+
+if __name__ == '__main__':
+    main()
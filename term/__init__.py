@@ -2,16 +2,24 @@
 
 # Authors: Steen Lumholt, Stefan H. Holek
 
+# pylint: disable=too-many-lines
+
 import sys
 import os
-import re
+import io
+import select
+import weakref
 
-from math import sqrt
 from termios import *
 
+try:
+    from time import monotonic as _monotonic
+except ImportError:
+    from time import time as _monotonic
+
 __all__ = ["setraw", "setcbreak", "rawmode", "cbreakmode",
            "IFLAG", "OFLAG", "CFLAG", "LFLAG", "ISPEED", "OSPEED", "CC",
-           "opentty", "readto", "TIMEOUT",
+           "opentty", "readto", "iterrecords", "TIMEOUT",
            "getyx"] # BBB
 
 # Indexes for termios list.
@@ -27,25 +35,86 @@ CC = 6
 MODE = 'r+b'
 
 # Wait up to 0.2 seconds for a response.
+# May be a float, e.g. 0.05 for 5 milliseconds.
 TIMEOUT = 2
 
 
-def setraw(fd, when=TCSAFLUSH, min=1, time=0):
-    """Put the terminal in raw mode.
+# Modes of fds inside rawmode and cbreakmode, fd -> list of modes.
+# The last mode is the current mode of the fd.
+_modestack = {}
 
-    Wait until at least `min` bytes or characters have been read.
-    If `min` is 0, give up after `time` (in 1/10ths of a second)
-    without data becoming available.
+
+def _fileno(fd):
+    """Return the file descriptor of fd."""
+    if isinstance(fd, int):
+        return fd
+    fileno = getattr(fd, 'fileno', None)
+    if fileno is None:
+        raise TypeError('argument must be an int, or have a fileno() method.')
+    return fileno()
+
+
+def _getmode(fd):
+    """Return the current mode of fd.
+
+    Modes of fds inside rawmode and cbreakmode are known and do not
+    require a tcgetattr call. Control characters are returned as ints.
     """
-    mode = tcgetattr(fd)
+    stack = _modestack.get(fd)
+    if stack:
+        mode = stack[-1]
+    else:
+        mode = tcgetattr(fd)
+    mode = list(mode)
+    mode[CC] = [x if isinstance(x, int) else ord(x) for x in mode[CC]]
+    return mode
+
+
+def _setmode(fd, when, mode, current):
+    """Set the mode of fd, unless it equals the current mode."""
+    if mode != current:
+        tcsetattr(fd, when, mode)
+        stack = _modestack.get(fd)
+        if stack:
+            stack[-1] = mode
+
+
+def _rawmode(mode, min, time):
+    """Return raw mode attributes based on mode."""
+    # pylint: disable=redefined-builtin
+    mode = list(mode)
     mode[IFLAG] = mode[IFLAG] & ~(BRKINT | ICRNL | INPCK | ISTRIP | IXON)
     mode[OFLAG] = mode[OFLAG] & ~(OPOST)
     mode[CFLAG] = mode[CFLAG] & ~(CSIZE | PARENB)
     mode[CFLAG] = mode[CFLAG] | CS8
     mode[LFLAG] = mode[LFLAG] & ~(ECHO | ICANON | IEXTEN | ISIG)
+    mode[CC] = list(mode[CC])
     mode[CC][VMIN] = min
     mode[CC][VTIME] = time
-    tcsetattr(fd, when, mode)
+    return mode
+
+
+def _cbreakmode(mode, min, time):
+    """Return cbreak mode attributes based on mode."""
+    # pylint: disable=redefined-builtin
+    mode = list(mode)
+    mode[LFLAG] = mode[LFLAG] & ~(ECHO | ICANON)
+    mode[CC] = list(mode[CC])
+    mode[CC][VMIN] = min
+    mode[CC][VTIME] = time
+    return mode
+
+
+def setraw(fd, when=TCSAFLUSH, min=1, time=0):
+    """Put the terminal in raw mode.
+
+    Wait until at least `min` bytes or characters have been read.
+    If `min` is 0, give up after `time` (in 1/10ths of a second)
+    without data becoming available.
+    """
+    fd = _fileno(fd)
+    mode = _getmode(fd)
+    _setmode(fd, when, _rawmode(mode, min, time), mode)
 
 
 def setcbreak(fd, when=TCSAFLUSH, min=1, time=0):
@@ -55,53 +124,73 @@ def setcbreak(fd, when=TCSAFLUSH, min=1, time=0):
     If `min` is 0, give up after `time` (in 1/10ths of a second)
     without data becoming available.
     """
-    mode = tcgetattr(fd)
-    mode[LFLAG] = mode[LFLAG] & ~(ECHO | ICANON)
-    mode[CC][VMIN] = min
-    mode[CC][VTIME] = time
-    tcsetattr(fd, when, mode)
+    fd = _fileno(fd)
+    mode = _getmode(fd)
+    _setmode(fd, when, _cbreakmode(mode, min, time), mode)
 
 
-class rawmode(object):
-    """Context manager to put the terminal in raw mode.
+class _modecontext(object):
+    """Base class of the mode context managers.
 
-    The current mode is saved and restored on exit.
+    Context managers record the modes they set in the mode stack of
+    the fd. Nested context managers do not read the mode from the
+    terminal, and set or restore it only when it changes.
+
+    `when` applies to entering and restoring the mode. Pass TCSANOW
+    or TCSADRAIN to keep input the user typed in the meantime.
+
+    Subclasses set `convert` to a function returning the new mode,
+    called with the current mode, `min`, and `time`.
     """
 
     def __init__(self, fd, when=TCSAFLUSH, min=1, time=0):
+        # pylint: disable=redefined-builtin
         self.fd = fd
         self.when = when
         self.min = min
         self.time = time
         self.savedmode = None
+        self._base = None
+        self._mode = None
 
     def __enter__(self):
-        self.savedmode = tcgetattr(self.fd)
-        setraw(self.fd, self.when, self.min, self.time)
+        fd = _fileno(self.fd)
+        self.savedmode = _getmode(fd)
+        # Compute the new mode once per base mode
+        if self.savedmode != self._base:
+            self._base = self.savedmode
+            self._mode = self.convert( # pylint: disable=no-member
+                self.savedmode, self.min, self.time)
+        if self._mode != self.savedmode:
+            tcsetattr(fd, self.when, self._mode)
+        _modestack.setdefault(fd, []).append(self._mode)
 
     def __exit__(self, *ignored):
-        tcsetattr(self.fd, TCSAFLUSH, self.savedmode)
+        fd = _fileno(self.fd)
+        stack = _modestack[fd]
+        mode = stack.pop()
+        if not stack:
+            del _modestack[fd]
+        if mode != self.savedmode:
+            tcsetattr(fd, self.when, self.savedmode)
 
 
-class cbreakmode(object):
-    """Context manager to put the terminal in cbreak mode.
+class rawmode(_modecontext):
+    """Context manager to put the terminal in raw mode.
 
     The current mode is saved and restored on exit.
     """
+    # pylint: disable=too-few-public-methods
+    convert = staticmethod(_rawmode)
 
-    def __init__(self, fd, when=TCSAFLUSH, min=1, time=0):
-        self.fd = fd
-        self.when = when
-        self.min = min
-        self.time = time
-        self.savedmode = None
 
-    def __enter__(self):
-        self.savedmode = tcgetattr(self.fd)
-        setcbreak(self.fd, self.when, self.min, self.time)
+class cbreakmode(_modecontext):
+    """Context manager to put the terminal in cbreak mode.
 
-    def __exit__(self, *ignored):
-        tcsetattr(self.fd, TCSAFLUSH, self.savedmode)
+    The current mode is saved and restored on exit.
+    """
+    # pylint: disable=too-few-public-methods
+    convert = staticmethod(_cbreakmode)
 
 
 def _opentty(device, bufsize, mode=MODE):
@@ -120,6 +209,10 @@ def _opentty(device, bufsize, mode=MODE):
             bufsize = 0
         return open(fd, mode, bufsize)
     else:
+        # Unbuffered binary files read one byte at a time; raw
+        # streams, as on Python 3, return whatever data is available
+        if bufsize == 0 and 'b' in mode:
+            return io.open(fd, mode, 0)
         return os.fdopen(fd, mode, bufsize)
 
 
@@ -149,19 +242,104 @@ class opentty(object):
             self.tty.close()
 
 
+# Read size for chunked reads.
+_BUFSIZE = 1024
+
+# Data read past the end of a reply, keyed by stream.
+_pushback = weakref.WeakKeyDictionary()
+
+
+def _seekable(stream):
+    """Return true if stream can be repositioned, ttys excluded."""
+    try:
+        return stream.seekable() and not stream.isatty()
+    except (AttributeError, ValueError, EnvironmentError):
+        return False
+
+
+def _unread(stream, data):
+    """Push data back so the next read returns it first.
+
+    Seekable streams are rewound. Other streams keep the data in a
+    pushback buffer, which only _read knows about.
+    """
+    if data:
+        if _seekable(stream):
+            stream.seek(stream.tell() - len(data))
+        else:
+            _pushback[stream] = data + _pushback.get(stream, data[:0])
+
+
+def _read(stream, size=_BUFSIZE):
+    """Read whatever data is available from stream, up to size bytes
+    or characters.
+
+    Returns pushed back data first. Otherwise reads from the stream
+    at most once. Streams that cannot hold pushed back data, and text
+    streams which may block on partial reads, are read one byte or
+    character at a time.
+    """
+    try:
+        data = _pushback.pop(stream, None)
+    except TypeError:
+        return stream.read(1)
+    if data:
+        return data
+    if hasattr(stream, 'read1'):
+        data = stream.read1(size)
+    elif isinstance(stream, (io.RawIOBase, io.StringIO)):
+        data = stream.read(size)
+    else:
+        data = stream.read(1)
+    # Non-blocking raw streams return None
+    if data is None:
+        data = b''
+    return data
+
+
+def _vtime():
+    """Return TIMEOUT as VTIME value, in whole 1/10ths of a second."""
+    return min(max(int(-(-TIMEOUT // 1)), 1), 255)
+
+
+def _wait(stream, deadline):
+    """Wait until stream is readable or the monotonic deadline passes.
+
+    Returns false on timeout. Streams with pushed back data, and
+    streams without file descriptor, are always readable. Data held
+    in a stream's own buffer is not seen; use unbuffered streams.
+    """
+    try:
+        if _pushback.get(stream):
+            return True
+    except TypeError:
+        pass
+    try:
+        fd = stream.fileno()
+    except (AttributeError, ValueError, EnvironmentError):
+        return True
+    timeout = deadline - _monotonic()
+    if timeout <= 0:
+        return False
+    return bool(select.select([fd], [], [], timeout)[0])
+
+
+def _findend(buf, endswith):
+    """Return the index after the first suffix found in buf, or -1."""
+    end = -1
+    for x in endswith:
+        i = buf.find(x)
+        if i >= 0 and (end < 0 or i + len(x) < end):
+            end = i + len(x)
+    return end
+
+
 def _readto(stream, stopbyte):
     """Read bytes from stream, up to and including stopbyte.
 
     Returns an empty bytes object on EOF.
     """
-    p = b''
-    c = stream.read(1)
-    while c:
-        p += c
-        if c == stopbyte:
-            break
-        c = stream.read(1)
-    return p
+    return readto(stream, stopbyte)
 
 
 def readto(stream, endswith):
@@ -172,24 +350,672 @@ def readto(stream, endswith):
     suffixes to try.
     Suffixes must be bytes or str depending on the stream.
     Empty suffixes are ignored.
+
+    Data is read in chunks. Seekable streams are left positioned
+    after the end of the buffer. For other streams, like ttys and
+    pipes, data read past the end of the buffer is kept and returned
+    by the next call to readto or iterrecords, but not by the
+    stream's own read methods.
     """
     if not isinstance(endswith, (tuple, list)):
         endswith = (endswith,)
 
-    c = stream.read(1)
+    c = _read(stream)
     if isinstance(c, str):
-        p = ''
         endswith = tuple(x for x in endswith if not isinstance(x, str) or x)
     else:
-        p = b''
         endswith = tuple(x for x in endswith if not isinstance(x, bytes) or x)
 
+    # Only the last len(suffix)-1 items of a chunk can start a match
+    # that ends in the next chunk.
+    keep = max([len(x) for x in endswith] or [1]) - 1
+    parts = []
+    tail = c[:0]
+
     while c:
-        p += c
-        if p.endswith(endswith):
+        if endswith:
+            end = _findend(tail + c, endswith)
+            if end >= 0:
+                end -= len(tail)
+                parts.append(c[:end])
+                _unread(stream, c[end:])
+                break
+            tail = (tail + c)[-keep:] if keep else c[:0]
+        parts.append(c)
+        c = _read(stream)
+    return c[:0].join(parts)
+
+
+# Read size for iterrecords.
+_RECORDSIZE = 65536
+
+
+def _rtrie(terminators):
+    """Return a trie of the reversed terminators."""
+    root = {}
+    for x in terminators:
+        node = root
+        for c in reversed(x):
+            node = node.setdefault(c, {})
+        node[None] = True
+    return root
+
+
+def _endsat(trie, buf, i, start, tail):
+    """Return true if a terminator ends at buf[i].
+
+    Walks back to buf[start], then through tail.
+    """
+    node = trie
+    for data, j, stop in ((buf, i, start), (tail, len(tail) - 1, 0)):
+        while j >= stop:
+            node = node.get(data[j])
+            if node is None:
+                return False
+            if None in node:
+                return True
+            j -= 1
+    return False
+
+
+def _classescape(char):
+    """Escape char for use in a regular expression character class."""
+    return '\\' + char if char in '\\]^-' else char
+
+
+def iterrecords(stream, terminators):
+    """Read `stream` in large chunks and yield records ending with one
+    of `terminators`.
+
+    The `terminators` argument may be a single suffix or a tuple of
+    suffixes. A record ends where the first terminator ends, like with
+    :func:`readto`. Data after the last terminator is yielded as the
+    last record.
+
+    Records contained in a single chunk of a binary stream are yielded
+    as memoryview slices of the chunk, without copying. Records spanning
+    chunks, and all records on Python 2, are yielded as bytes. If the
+    iterator is closed early, the data read past the last record is
+    kept for the next read.
+    """
+    # pylint: disable=too-many-locals
+    if not isinstance(terminators, (tuple, list)):
+        terminators = (terminators,)
+    c = _read(stream, _RECORDSIZE)
+    empty = c[:0]
+    terminators = [x for x in terminators if x]
+    keep = max([len(x) for x in terminators] or [1]) - 1
+    trie = _rtrie(terminators)
+
+    # Find the last items of terminators at C speed; then confirm
+    # matches by walking back through the trie.
+    if isinstance(c, bytes):
+        pattern = ('[%s]' % ''.join('\\x%02x' % ord(x[-1:]) for x in terminators)).encode()
+    else:
+        pattern = '[%s]' % ''.join(_classescape(x[-1:]) for x in terminators)
+    finditer = _re(pattern).finditer if terminators else lambda c: ()
+    # Python 2 memoryviews do not convert to bytes
+    views = isinstance(c, bytes) and bytes is not str
+
+    parts = []
+    tail = empty
+    start = 0
+    try:
+        while c:
+            view = memoryview(c) if views else c
+            start = 0
+            for m in finditer(c):
+                end = m.end()
+                if not _endsat(trie, c, end - 1, start, tail):
+                    continue
+                if parts:
+                    parts.append(c[start:end])
+                    record = empty.join(parts)
+                    parts = []
+                else:
+                    record = view[start:end]
+                start = end
+                tail = empty
+                yield record
+            if start < len(c):
+                rest = c[start:]
+                parts.append(rest)
+                if keep:
+                    tail = (tail + rest[-keep:])[-keep:]
+            c = _read(stream, _RECORDSIZE)
+        if parts:
+            yield empty.join(parts)
+    except GeneratorExit:
+        _unread(stream, c[start:])
+        raise
+
+
+class Metrics(object):
+    """Query timings and counters.
+
+    Timings are recorded per phase in histograms with power-of-two
+    microsecond buckets. Phases are 'open', 'mode', 'write', 'firstbyte',
+    'reply', 'restore', and 'total'. Counters are 'queries', 'timeouts',
+    'parsefailures', 'latereplies', 'typeaheaddropped', and 'bytesread'.
+
+    Hooks added with :meth:`addhook` are called with the name and value
+    of every timing (in seconds) and count recorded.
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+        self.hooks = []
+
+    def record(self, phase, seconds):
+        """Record a timing for phase."""
+        timing = self.timings.get(phase)
+        if timing is None:
+            timing = self.timings[phase] = [0, 0.0, seconds, seconds, {}]
+        timing[0] += 1
+        timing[1] += seconds
+        if seconds < timing[2]:
+            timing[2] = seconds
+        if seconds > timing[3]:
+            timing[3] = seconds
+        # Bucket n holds timings below 2**n microseconds
+        bucket = int(seconds * 1e6).bit_length()
+        timing[4][bucket] = timing[4].get(bucket, 0) + 1
+        for hook in self.hooks:
+            hook(phase, seconds)
+
+    def count(self, counter, n=1):
+        """Increment counter by n."""
+        self.counters[counter] = self.counters.get(counter, 0) + n
+        for hook in self.hooks:
+            hook(counter, n)
+
+    def percentile(self, phase, p):
+        """Return an upper bound in seconds for the `p` (0-1) percentile
+        of phase, or None if nothing was recorded.
+        """
+        timing = self.timings.get(phase)
+        if timing is None:
+            return None
+        rank = p * timing[0]
+        seen = 0
+        for bucket in sorted(timing[4]):
+            seen += timing[4][bucket]
+            if seen >= rank:
+                return min(2 ** bucket / 1e6, timing[3])
+        return timing[3]
+
+    def export(self):
+        """Return timings and counters as a dictionary.
+
+        Histogram buckets are keyed by their upper bound in microseconds.
+        """
+        timings = {}
+        for phase, (count, total, lo, hi, buckets) in self.timings.items():
+            timings[phase] = {
+                'count': count,
+                'sum': total,
+                'min': lo,
+                'max': hi,
+                'buckets': dict((2 ** b, n) for b, n in buckets.items()),
+            }
+        return {'timings': timings, 'counters': dict(self.counters)}
+
+    def reset(self):
+        """Discard all timings and counters."""
+        self.timings.clear()
+        self.counters.clear()
+
+    def addhook(self, hook):
+        """Add a hook to call with every timing and count recorded."""
+        self.hooks.append(hook)
+
+    def removehook(self, hook):
+        """Remove a hook."""
+        self.hooks.remove(hook)
+
+
+# The metrics object, None if disabled.
+_metrics = None
+
+
+def enablemetrics(metrics=None):
+    """Enable query instrumentation and return the metrics object.
+
+    If `metrics` is None, a new :class:`Metrics` object is created.
+    """
+    global _metrics # pylint: disable=global-statement
+    _metrics = metrics if metrics is not None else Metrics()
+    return _metrics
+
+
+def disablemetrics():
+    """Disable query instrumentation."""
+    global _metrics # pylint: disable=global-statement
+    _metrics = None
+
+
+def _lap(phase, start):
+    """Record the time since start for phase and return the current time.
+
+    Does nothing and returns None if instrumentation is disabled.
+    If phase or start is None, nothing is recorded.
+    """
+    m = _metrics
+    if m is None:
+        return None
+    now = _monotonic()
+    if phase is not None and start is not None:
+        m.record(phase, now - start)
+    return now
+
+
+def _count(counter, n=1):
+    """Increment counter if instrumentation is enabled."""
+    if _metrics is not None:
+        _metrics.count(counter, n)
+
+
+# Compiled regular expressions, pattern -> regex.
+_compiled = {}
+
+
+def _re(pattern):
+    """Return the compiled regular expression for pattern.
+
+    The re module is imported, and patterns compiled, on first use.
+    """
+    try:
+        return _compiled[pattern]
+    except KeyError:
+        # pylint: disable=import-outside-toplevel
+        import re
+        regex = _compiled[pattern] = re.compile(pattern)
+        return regex
+
+
+class _QueryTable(dict):
+    """Registered queries, name -> (request, pattern, convert, default).
+
+    The palette queries 'color0' to 'color255' are added on first use.
+    """
+
+    def __missing__(self, what):
+        if what not in _paletteindex:
+            raise KeyError(what)
+        entry = self[what] = (b'\033]4;%d;?\007' % _paletteindex[what],
+                              _PALETTEREPLY, _palettecolor, (-1, -1, -1))
+        return entry
+
+
+_queries = _QueryTable()
+
+# Names of capabilities which may be cached.
+_cacheable = set(['numcolors'])
+
+# Matches a complete CSI, OSC, or DCS reply.
+_REPLY = (b'\033(?:\\[[\x30-\x3f]*[\x20-\x2f]*[\x40-\x7e]'
+          b'|[\\]P][^\x07\x1b]*(?:\x07|\x1b\\\\))')
+
+
+def registerquery(what, request, pattern, convert, default, cache=False):
+    """Register a terminal query for use with :func:`query`.
+
+    `what` is the name of the query.
+    `request` is the escape sequence written to the terminal.
+    `pattern` is a regular expression matching the complete reply.
+    `convert` is called with the match object and returns the result.
+    `default` is returned if the terminal does not reply.
+    If `cache` is true, results may be kept in the capability cache.
+    """
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    _queries[what] = (request, pattern, convert, default)
+    if cache:
+        _cacheable.add(what)
+    else:
+        _cacheable.discard(what)
+
+
+def _matchreply(reply, names):
+    """Return (name, match) of the first query in names matching reply."""
+    if reply.startswith(b'\033]4;'):
+        # Palette replies are looked up by their color index
+        r = _re(_PALETTEREPLY).match(reply)
+        if r is not None and r.end() == len(reply):
+            index = int(r.group(1))
+            if index < _PALETTESIZE and _palettenames[index] in names:
+                return _palettenames[index], r
+        return None, None
+    for what in names:
+        r = _re(_queries[what][1]).match(reply)
+        if r is not None and r.end() == len(reply):
+            return what, r
+    return None, None
+
+
+def _scanreplies(buf, pending, results, typeahead=None):
+    """Match complete replies in buf against pending queries.
+
+    Stores results and removes answered queries from pending.
+    Returns the unconsumed rest of buf. Scanning stops after the
+    last pending DA1 reply.
+
+    Replies to queries no longer pending, e.g. replies arriving after
+    a timeout, are dropped. While DA1 replies to earlier queries are
+    pending at the front, all other replies belong to those queries
+    and are dropped too. If `typeahead` is a bytearray, everything
+    else, like keys the user typed, is appended to it.
+    """
+    end = 0
+    for m in _re(_REPLY).finditer(buf):
+        if typeahead is not None:
+            typeahead += buf[end:m.start()]
+        reply = m.group()
+        end = m.end()
+        stale = len(pending) > 1 and pending[0] == 'da1'
+        what, r = _matchreply(reply, pending[:1] if stale else pending)
+        if what is not None:
+            if not stale:
+                results[what] = _queries[what][2](r)
+            pending.remove(what)
+            if what == 'da1' and what not in pending:
+                return buf[end:]
+        elif _matchreply(reply, _queries)[0] is not None:
+            _count('latereplies')
+        elif reply[1:2] == b'[':
+            # CSI sequences are sent by keys
+            if typeahead is not None:
+                typeahead += reply
+        else:
+            _count('parsefailures')
+    rest = buf[end:]
+    i = rest.find(b'\033')
+    if i < 0:
+        i = len(rest)
+    if typeahead is not None:
+        typeahead += rest[:i]
+    return rest[i:]
+
+
+def _addleftover(typeahead, buf):
+    """Append data left over after a query to typeahead.
+
+    The start of a reply cut off by a timeout is dropped.
+    """
+    if buf[1:2] not in (b'[', b']', b'P'):
+        typeahead += buf
+
+
+def _pending(names, stale=0):
+    """Return the queries to wait for.
+
+    These are `stale` DA1 replies to earlier queries, then names
+    without duplicates, then DA1.
+    """
+    pending = ['da1'] * stale
+    seen = set()
+    for what in names:
+        if what not in seen:
+            seen.add(what)
+            pending.append(what)
+    if 'da1' not in seen:
+        pending.append('da1')
+    return pending
+
+
+def _query(tty, names, typeahead=None, timeout=None, link=None):
+    """Write all queries to tty, then read and match the replies.
+
+    Returns a dictionary of the answered queries.
+
+    DA1 is sent last. Because every terminal answers DA1, and replies
+    arrive in order, its reply means the terminal is done and queries
+    still pending are unsupported.
+
+    If `typeahead` is a bytearray, input that is not a reply is
+    appended to it. Otherwise it is dropped, and data read past the
+    DA1 reply is pushed back onto tty.
+
+    If `timeout` is given, reads stop that many seconds after the
+    queries were written, no matter how slowly replies trickle in.
+    tty should be unbuffered, and in a mode where reads return once
+    data is available.
+
+    If `link` is given, the round-trip time is recorded in it, and
+    DA1 replies to earlier queries which timed out are skipped.
+    """
+    stale = _stale(link) if link is not None else 0
+    pending = _pending(names, stale)
+    t = _lap(None, None)
+    tty.write(b''.join(_queries[x][0] for x in pending[stale:]))
+    tty.flush()
+    sent = _monotonic()
+    t = start = _lap('write', t)
+    deadline = sent + timeout if timeout is not None else None
+    results = {}
+    buf = b''
+    first = True
+    while 'da1' in pending:
+        if timeout is not None and not _wait(tty, deadline):
             break
-        c = stream.read(1)
-    return p
+        c = _read(tty)
+        if not c:
+            break
+        if t is not None:
+            if first:
+                _lap('firstbyte', start)
+                first = False
+            _count('bytesread', len(c))
+        buf = _scanreplies(buf + c, pending, results, typeahead)
+    if typeahead is not None:
+        _addleftover(typeahead, buf)
+    else:
+        _unread(tty, buf)
+    if link is not None:
+        _settle(link, sent, stale, pending.count('da1'))
+    if t is not None:
+        _count('queries')
+        if 'da1' in pending:
+            _count('timeouts')
+        else:
+            _lap('reply', start)
+    return results
+
+
+# Maximum size of the typeahead buffer of a device.
+_TYPEAHEADMAX = 4096
+
+# Input read during queries, device -> bytes.
+_typeahead = {}
+
+
+def _savetypeahead(device, data):
+    """Append data to the typeahead buffer of device."""
+    if data:
+        data = _typeahead.get(device, b'') + bytes(data)
+        if len(data) > _TYPEAHEADMAX:
+            _count('typeaheaddropped', len(data) - _TYPEAHEADMAX)
+            data = data[:_TYPEAHEADMAX]
+        _typeahead[device] = data
+
+
+def readtypeahead(device=None):
+    """Return and clear the input read from device during queries.
+
+    Queries switch modes without flushing input, and keep what the user
+    typed while waiting for replies. Returns b'' if there is none.
+    `device` defaults to :attr:`opentty.device`.
+    """
+    return _typeahead.pop(device or opentty.device, b'')
+
+
+class AdaptiveTimeout(object):
+    """Query timeout computed from measured round-trip times.
+
+    Keeps a smoothed round-trip time `srtt` and its mean deviation
+    `rttvar` the way TCP does (RFC 6298). The timeout is
+    srtt + 4 * rttvar, but at least `floor` and at most `ceiling`
+    seconds. Each timeout doubles it, up to `ceiling`, until the next
+    round trip is measured. Before the first measurement the timeout
+    is :attr:`TIMEOUT`.
+
+    `outstanding` holds the send times of queries which timed out
+    and whose DA1 replies are still expected. They are skipped by the
+    next query. Replies expected for longer than `ceiling` seconds
+    are presumed lost, e.g. read by another program.
+    """
+
+    alpha = 0.125
+    beta = 0.25
+
+    def __init__(self, floor=0.01, ceiling=2.0):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.srtt = None
+        self.rttvar = None
+        self.rto = None
+        self.outstanding = []
+
+    def _clamp(self, seconds):
+        return min(max(seconds, self.floor), self.ceiling)
+
+    def timeout(self):
+        """Return the query timeout in seconds."""
+        if self.rto is None:
+            return self._clamp(TIMEOUT / 10.0)
+        return self.rto
+
+    def update(self, rtt):
+        """Record a round-trip time in seconds."""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar += self.beta * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.alpha * (rtt - self.srtt)
+        self.rto = self._clamp(self.srtt + 4 * self.rttvar)
+
+    def backoff(self):
+        """Double the timeout after a query timed out."""
+        self.rto = self._clamp(self.timeout() * 2)
+
+
+def _stale(link):
+    """Return the number of DA1 replies to earlier queries on link."""
+    limit = _monotonic() - max(link.ceiling, TIMEOUT / 10.0)
+    link.outstanding = [x for x in link.outstanding if x > limit]
+    return len(link.outstanding)
+
+
+def _settle(link, sent, stale, remaining):
+    """Update link after a query sent at `sent`.
+
+    `stale` is the number of DA1 replies to earlier queries waited
+    for, `remaining` the number of DA1 replies not received.
+    """
+    if remaining:
+        link.backoff()
+        link.outstanding = (link.outstanding + [sent])[-remaining:]
+    else:
+        # Like Karn's algorithm, only measure unambiguous round trips
+        if not stale:
+            link.update(_monotonic() - sent)
+        link.outstanding = []
+
+
+# AdaptiveTimeout arguments if enabled, else None.
+_adaptive = None
+
+# Round-trip state of terminals, device -> AdaptiveTimeout.
+_links = {}
+
+
+def _link(device):
+    """Return the round-trip state of device."""
+    link = _links.get(device)
+    if link is None:
+        link = _links[device] = AdaptiveTimeout(*(_adaptive or ()))
+    return link
+
+
+def _timeout(link):
+    """Return the query timeout for link in seconds."""
+    if _adaptive is not None:
+        return link.timeout()
+    return TIMEOUT / 10.0
+
+
+def enableadaptivetimeout(floor=0.01, ceiling=2.0):
+    """Compute query timeouts from measured round-trip times.
+
+    Round trips are measured per terminal device. Timeouts are at least
+    `floor` and at most `ceiling` seconds. See :class:`AdaptiveTimeout`.
+    """
+    global _adaptive # pylint: disable=global-statement
+    _adaptive = (floor, ceiling)
+    _links.clear()
+
+
+def disableadaptivetimeout():
+    """Use :attr:`TIMEOUT` for all queries."""
+    global _adaptive # pylint: disable=global-statement
+    _adaptive = None
+    _links.clear()
+
+
+def gettimeout(device=None):
+    """Return the timeout of the next query to device in seconds.
+
+    `device` defaults to :attr:`opentty.device`.
+    """
+    return _timeout(_link(device or opentty.device))
+
+
+def _results(names, results):
+    """Return a tuple of results, using defaults for missing names."""
+    return tuple(results.get(x, _queries[x][3]) for x in names)
+
+
+def query(*names):
+    """Query the terminal for one or more registered values.
+
+    All queries are written at once and the replies are read in a
+    single round trip. Returns a tuple of results in the order of
+    `names`. A result is its query's default if the device cannot be
+    opened or the terminal does not reply.
+
+    Input the user types while the query runs is kept, see
+    :func:`readtypeahead`.
+
+    Registered queries are 'yx', 'fgcolor', 'bgcolor', and 'da1'.
+    """
+    results, missing = _cachelookup(opentty.device, names)
+    if missing:
+        t = start = _lap(None, None)
+        with opentty(bufsize=0) as tty:
+            t = _lap('open', t)
+            if tty is not None:
+                typeahead = bytearray()
+                with cbreakmode(tty, TCSANOW):
+                    t = _lap('mode', t)
+                    link = _link(opentty.device)
+                    answered = _query(tty, missing, typeahead, _timeout(link), link)
+                    t = _lap(None, t)
+                _lap('restore', t)
+                _savetypeahead(opentty.device, typeahead)
+                _cachestore(opentty.device, answered)
+                results.update(answered)
+        _lap('total', start)
+    return _results(names, results)
+
+
+# da1: printf '\033[c' -> b'\x1b[?62;22c'
+
+def _da1(m):
+    return tuple(int(x, 10) for x in m.group(1).split(b';') if x)
+
+
+registerquery('da1', b'\033[c', b'\033\\[\\?([\\d;]*)c', _da1, (), cache=True)
 
 
 # linecol: printf '\033[6n' -> b'\x1b[24;1R'
@@ -198,42 +1024,65 @@ def _readyx(stream):
     """Read a CPR response from stream."""
     p = readto(stream, b'R')
     if p:
-        m = re.search(b'(\\d+);(\\d+)R$', p)
+        m = _re(b'(\\d+);(\\d+)R$').search(p)
         if m is not None:
             return int(m.group(1), 10), int(m.group(2), 10)
     return 0, 0
 
 
+def _yx(m):
+    return int(m.group(1), 10), int(m.group(2), 10)
+
+
+registerquery('yx', b'\033[6n', b'\033\\[(\\d+);(\\d+)R', _yx, (0, 0))
+
+
 def getyx():
     """Return the cursor position as 1-based (line, col) tuple.
 
     Line and col are 0 if the device cannot be opened or
     does not support DSR 6.
     """
-    with opentty() as tty:
-        if tty is not None:
-            with cbreakmode(tty, min=0, time=TIMEOUT):
-                tty.write(b'\033[6n')
-                return _readyx(tty)
-    return 0, 0
+    return query('yx')[0]
+
+
+def _textyx(stream, device):
+    """Read text up to the DA1 reply and return the cursor position.
+
+    Other input, like keys the user typed, is kept as typeahead of
+    device.
+    """
+    p = readto(stream, 'c')
+    while p.endswith('c') and not _re(r'\033\[\?[\d;]*c$').search(p):
+        s = readto(stream, 'c') # A typed c
+        if not s:
+            break
+        p += s
+    yx = 0, 0
+    m = _re(r'\033\[(\d+);(\d+)R').search(p)
+    if m is not None:
+        yx = int(m.group(1)), int(m.group(2))
+        p = p[:m.start()] + p[m.end():]
+    p = _re(r'\033\[\?[\d;]*c$').sub('', p)
+    if not isinstance(p, bytes):
+        p = p.encode(getattr(stream, 'encoding', None) or 'utf-8', 'replace')
+    _savetypeahead(device, p)
+    return yx
 
 
 def getyx_text_mode():
     """Return the cursor position as 1-based (line, col) tuple.
 
     Line and col are 0 if the terminal does not support
-    DSR 6.
+    DSR 6. DA1 is sent last, see :func:`query`. Input the user
+    types meanwhile is kept, see :func:`readtypeahead`.
     """
     with opentty(mode='r+') as tty:
         if tty is not None:
-            with cbreakmode(tty, min=0, time=TIMEOUT):
-                tty.write('\033[6n')
+            with cbreakmode(tty, TCSANOW, min=0, time=_vtime()):
+                tty.write('\033[6n\033[c')
                 tty.flush()
-                p = readto(tty, 'R')
-                if p:
-                    m = re.search(r'(\d+);(\d+)R$', p)
-                    if m is not None:
-                        return int(m.group(1)), int(m.group(2))
+                return _textyx(tty, opentty.device)
     return 0, 0
 
 
@@ -241,17 +1090,15 @@ def getyx_stdin_stdout():
     """Return the cursor position as 1-based (line, col) tuple.
 
     Line and col are 0 if the terminal does not support
-    DSR 6.
+    DSR 6. DA1 is sent last, see :func:`query`. Input the user
+    types meanwhile is kept as typeahead of :attr:`opentty.device`,
+    see :func:`readtypeahead`.
     """
     if sys.stdin.isatty() and sys.stdout.isatty():
-        with cbreakmode(sys.stdin, min=0, time=TIMEOUT):
-            sys.stdout.write('\033[6n')
+        with cbreakmode(sys.stdin, TCSANOW, min=0, time=_vtime()):
+            sys.stdout.write('\033[6n\033[c')
             sys.stdout.flush()
-            p = readto(sys.stdin, 'R')
-            if p:
-                m = re.search(r'(\d+);(\d+)R$', p)
-                if m is not None:
-                    return int(m.group(1)), int(m.group(2))
+            return _textyx(sys.stdin, opentty.device)
     return 0, 0
 
 
@@ -262,24 +1109,32 @@ def _readcolor(stream):
     """Read an RGB color response from stream."""
     p = readto(stream, b'\007')
     if p:
-        m = re.search(b'rgb:([0-9a-fA-F]+)/([0-9a-fA-F]+)/([0-9a-fA-F]+)\007$', p)
+        m = _re(b'rgb:([0-9a-fA-F]+)/([0-9a-fA-F]+)/([0-9a-fA-F]+)\007$').search(p)
         if m is not None:
             return int(m.group(1), 16), int(m.group(2), 16), int(m.group(3), 16)
     return -1, -1, -1
 
 
+def _rgb(m):
+    return int(m.group(1), 16), int(m.group(2), 16), int(m.group(3), 16)
+
+
+registerquery('fgcolor', b'\033]10;?\007',
+              b'\033]10;rgb:([0-9a-fA-F]+)/([0-9a-fA-F]+)/([0-9a-fA-F]+)(?:\007|\033\\\\)',
+              _rgb, (-1, -1, -1), cache=True)
+
+registerquery('bgcolor', b'\033]11;?\007',
+              b'\033]11;rgb:([0-9a-fA-F]+)/([0-9a-fA-F]+)/([0-9a-fA-F]+)(?:\007|\033\\\\)',
+              _rgb, (-1, -1, -1), cache=True)
+
+
 def getfgcolor():
     """Return the terminal foreground color as (r, g, b) tuple.
 
     All values are -1 if the device cannot be opened or does not
     support OSC 10.
     """
-    with opentty() as tty:
-        if tty is not None:
-            with cbreakmode(tty, min=0, time=TIMEOUT):
-                tty.write(b'\033]10;?\007')
-                return _readcolor(tty)
-    return -1, -1, -1
+    return query('fgcolor')[0]
 
 
 def getbgcolor():
@@ -288,12 +1143,71 @@ def getbgcolor():
     All values are -1 if the device cannot be opened or does not
     support OSC 11.
     """
-    with opentty() as tty:
-        if tty is not None:
-            with cbreakmode(tty, min=0, time=TIMEOUT):
-                tty.write(b'\033]11;?\007')
-                return _readcolor(tty)
-    return -1, -1, -1
+    return query('bgcolor')[0]
+
+
+# color0 ... color255: printf '\033]4;1;?\007' -> b'\x1b]4;1;rgb:cdcd/0000/0000\x07'
+# Terminals reply with 1 to 4 hex digits per channel, rgba:, or #rrggbb.
+
+_PALETTESPEC = b'(rgba?:[0-9a-fA-F]{1,4}(?:/[0-9a-fA-F]{1,4}){2,3}|#[0-9a-fA-F]{3,12})'
+
+
+def _scale(digits):
+    """Scale 1 to 4 hex digits to 16 bits."""
+    return int(digits, 16) * 0xffff // ((1 << (4 * len(digits))) - 1)
+
+
+def _palettecolor(m):
+    spec = m.group(2)
+    if spec.startswith(b'#'):
+        n, rest = divmod(len(spec) - 1, 3)
+        if rest:
+            return (-1, -1, -1)
+        channels = [spec[1+i*n:1+(i+1)*n] for i in range(3)]
+    else:
+        channels = spec.split(b':')[1].split(b'/')[:3]
+    return tuple(_scale(x) for x in channels)
+
+
+# Matches the reply for any color, the index is group 1.
+_PALETTEREPLY = b'\033]4;(\\d+);' + _PALETTESPEC + b'(?:\007|\033\\\\)'
+
+_PALETTESIZE = 256
+
+# Names of the palette queries, see _QueryTable.
+_palettenames = tuple('color%d' % i for i in range(_PALETTESIZE))
+_paletteindex = dict((what, i) for i, what in enumerate(_palettenames))
+
+_cacheable.update(_palettenames)
+
+
+def _palettequeries(count):
+    """Return the names of the first `count` palette queries."""
+    if not 0 <= count <= _PALETTESIZE:
+        raise ValueError('count must be between 0 and %d' % _PALETTESIZE)
+    return _palettenames[:count]
+
+
+def _palettearray(colors):
+    """Return colors as flat array of r, g, b values."""
+    # pylint: disable=import-outside-toplevel
+    from array import array
+    values = array('i')
+    for color in colors:
+        values.extend(color)
+    return values
+
+
+def getpalette(count=16):
+    """Return the first `count` colors of the terminal palette as flat
+    array of r, g, b values.
+
+    Color i is at index 3 * i. All OSC 4 queries are written at once
+    and the replies are read in a single round trip. Values are scaled
+    to 16 bits; they are -1 for colors the terminal does not report.
+    Raises ValueError if `count` is greater than 256.
+    """
+    return _palettearray(query(*_palettequeries(count)))
 
 
 def name():
@@ -309,7 +1223,7 @@ def isxterm():
 def luminance(rgb):
     """Compute perceived brightness of RGB color tuple."""
     # https://alienryderflex.com/hsp.html
-    return sqrt(0.299*rgb[0]**2 + 0.587*rgb[1]**2 + 0.114*rgb[2]**2)
+    return (0.299*rgb[0]**2 + 0.587*rgb[1]**2 + 0.114*rgb[2]**2) ** 0.5
 
 
 def islightmode():
@@ -318,11 +1232,9 @@ def islightmode():
     May return None if the device cannot be opened or
     does not support OSC 10 & 11.
     """
-    bgcolor = getbgcolor()
-    if bgcolor[0] >= 0:
-        fgcolor = getfgcolor()
-        if fgcolor[0] >= 0:
-            return luminance(bgcolor) > luminance(fgcolor)
+    bgcolor, fgcolor = query('bgcolor', 'fgcolor')
+    if bgcolor[0] >= 0 and fgcolor[0] >= 0:
+        return luminance(bgcolor) > luminance(fgcolor)
 
 
 def isdarkmode():
@@ -331,11 +1243,45 @@ def isdarkmode():
     May return None if the device cannot be opened or
     does not support OSC 10 & 11.
     """
-    bgcolor = getbgcolor()
-    if bgcolor[0] >= 0:
-        fgcolor = getfgcolor()
-        if fgcolor[0] >= 0:
-            return luminance(bgcolor) < luminance(fgcolor)
+    bgcolor, fgcolor = query('bgcolor', 'fgcolor')
+    if bgcolor[0] >= 0 and fgcolor[0] >= 0:
+        return luminance(bgcolor) < luminance(fgcolor)
+
+
+# The curses module, imported on first use.
+_curses = None
+
+
+def _getnumcolors(tty):
+    """Return the number of colors supported by the terminal.
+
+    Reads the terminfo entry with :mod:`term.terminfo`, and falls back
+    to curses if there is none, e.g. with a hashed database. Returns
+    None if there is no entry and `tty` is None.
+    """
+    # pylint: disable=import-outside-toplevel
+    from term.terminfo import load
+    entry = load(name())
+    if entry is not None:
+        return max(entry.getnum('colors'), 0)
+    if tty is None:
+        return None
+
+    global _curses # pylint: disable=global-statement
+    if _curses is None:
+        # pylint: disable=import-outside-toplevel
+        import curses
+        _curses = curses
+    curses = _curses
+
+    try:
+        curses.setupterm(name(), tty.fileno())
+        colors = curses.tigetnum('colors')
+        if colors >= 0:
+            return colors
+    except curses.error:
+        pass
+    return 0
 
 
 def getnumcolors():
@@ -344,19 +1290,18 @@ def getnumcolors():
     The result is 0 if the device cannot be opened
     or has no color support.
     """
-    # pylint: disable=import-outside-toplevel
-    import curses
-
-    with opentty() as tty:
-        if tty is not None:
-            try:
-                curses.setupterm(name(), tty.fileno())
-                colors = curses.tigetnum('colors')
-                if colors >= 0:
-                    return colors
-            except curses.error:
-                pass
-    return 0
+    results, missing = _cachelookup(opentty.device, ('numcolors',))
+    if missing:
+        # The device is opened only for curses
+        colors = _getnumcolors(None)
+        if colors is None:
+            with opentty() as tty:
+                if tty is not None:
+                    colors = _getnumcolors(tty)
+        if colors is not None:
+            results['numcolors'] = colors
+            _cachestore(opentty.device, results)
+    return results.get('numcolors', 0)
 
 
 def iscolor():
@@ -369,6 +1314,551 @@ def is256color():
     return getnumcolors() >= 256
 
 
+# Window sizes as (lines, cols, height, width) tuples, keyed by device.
+# Cleared by the SIGWINCH handler.
+_sizes = {}
+
+# True if the SIGWINCH handler is installed.
+_watching = False
+
+# The SIGWINCH handler replaced by ours.
+_prevwinch = None
+
+
+def _onsigwinch(signum, frame):
+    """Mark all window sizes stale and chain to the previous handler."""
+    _sizes.clear()
+    if callable(_prevwinch):
+        _prevwinch(signum, frame)
+
+
+def _watchsize():
+    """Install the SIGWINCH handler once.
+
+    Returns true if window sizes may be cached, that is while the
+    handler is installed. Handlers can only be installed from the main
+    thread, and the application may replace ours, e.g. with curses.
+    """
+    global _watching, _prevwinch # pylint: disable=global-statement
+    # pylint: disable=import-outside-toplevel
+    import signal
+    if not _watching:
+        try:
+            _prevwinch = signal.signal(signal.SIGWINCH, _onsigwinch)
+        except (ValueError, AttributeError):
+            return False
+        _watching = True
+    return signal.getsignal(signal.SIGWINCH) is _onsigwinch
+
+
+def _cachedsize(device):
+    """Return the cached window size of device, or None."""
+    size = _sizes.get(device)
+    if size is not None and not _watchsize():
+        # Without our handler, resizes go unnoticed
+        _sizes.clear()
+        return None
+    return size
+
+
+def _ioctlsize(tty):
+    """Return the window size reported by the kernel, or None."""
+    # pylint: disable=import-outside-toplevel
+    import fcntl
+    import struct
+    try:
+        data = fcntl.ioctl(tty.fileno(), TIOCGWINSZ, b'\0' * 8)
+    except EnvironmentError:
+        return None
+    lines, cols, width, height = struct.unpack('HHHH', data)
+    if lines and cols:
+        return lines, cols, height, width
+    return None
+
+
+def _probesize(tty, device):
+    """Return the window size found by moving the cursor to the
+    bottom right corner and asking for its position, or None.
+
+    The tty must be in cbreak mode.
+    """
+    typeahead = bytearray()
+    link = _link(device)
+    tty.write(b'\0337\033[9999;9999H')
+    try:
+        answered = _query(tty, ['yx'], typeahead, _timeout(link), link)
+    finally:
+        tty.write(b'\0338')
+        tty.flush()
+    _savetypeahead(device, typeahead)
+    lines, cols = answered.get('yx', (0, 0))
+    if lines and cols:
+        return lines, cols, 0, 0
+    return None
+
+
+def _getsize(device, tty=None):
+    """Return the window size of device as (lines, cols, height, width)
+    tuple, reading it from the cache, the kernel, or the terminal.
+    """
+    size = _cachedsize(device)
+    if size is None:
+        if tty is not None:
+            size = _ioctlsize(tty) or _probesize(tty, device)
+        else:
+            with opentty(bufsize=0) as t:
+                if t is not None:
+                    size = _ioctlsize(t)
+                    if size is None:
+                        with cbreakmode(t, TCSANOW):
+                            size = _probesize(t, device)
+        if size is None:
+            return 0, 0, 0, 0
+        if _watchsize():
+            _sizes[device] = size
+    return size
+
+
+def getsize():
+    """Return the terminal size as (lines, cols) tuple.
+
+    The size is read with TIOCGWINSZ, or by moving the cursor to the
+    bottom right corner and sending DSR 6 if the kernel does not know
+    it. Results are cached until the next SIGWINCH.
+
+    Lines and cols are 0 if the device cannot be opened or the size
+    cannot be determined.
+    """
+    return _getsize(opentty.device)[:2]
+
+
+def getpixelsize():
+    """Return the size of the text area in pixels as (height, width) tuple.
+
+    Height and width are 0 if the kernel does not know them.
+    """
+    return _getsize(opentty.device)[2:]
+
+
+def invalidatesize():
+    """Mark the cached terminal sizes stale, like SIGWINCH does."""
+    _sizes.clear()
+
+
+class CapabilityCache(object):
+    """Cache of terminal capabilities.
+
+    Entries are keyed by tty device, TERM, and capability name, and
+    expire after `ttl` seconds. If `ttl` is None, entries never expire.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.entries = {}
+        self.hooks = []
+
+    def now(self):
+        """Return the current time used for expiry."""
+        return _monotonic()
+
+    def get(self, device, what):
+        """Return the cached value or None."""
+        key = (device, name(), what)
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires is None or self.now() < expires:
+                return value
+            del self.entries[key]
+        return None
+
+    def set(self, device, what, value):
+        """Store a value."""
+        expires = None
+        if self.ttl is not None:
+            expires = self.now() + self.ttl
+        self.entries[(device, name(), what)] = (value, expires)
+
+    def update(self, device, values):
+        """Store the values of a dictionary, keyed by capability name."""
+        for what, value in values.items():
+            CapabilityCache.set(self, device, what, value)
+
+    def invalidate(self, *whats):
+        """Remove entries for capabilities `whats`, or all entries
+        if no names are given.
+
+        Calls the refresh hooks with `whats` afterwards.
+        """
+        if whats:
+            for key in list(self.entries):
+                if key[2] in whats:
+                    del self.entries[key]
+        else:
+            self.entries.clear()
+        for hook in list(self.hooks):
+            hook(whats)
+
+    def addhook(self, hook):
+        """Add a refresh hook to call when entries are invalidated."""
+        self.hooks.append(hook)
+
+    def removehook(self, hook):
+        """Remove a refresh hook."""
+        self.hooks.remove(hook)
+
+
+def _session():
+    """Return a key identifying the current terminal session."""
+    sid = os.getsid(0)
+    tty = ''
+    for fd in (0, 1, 2):
+        if os.isatty(fd):
+            tty = os.ttyname(fd)
+            break
+    # Session ids are reused; the leader's start time is not
+    started = ''
+    try:
+        with open('/proc/%d/stat' % sid, 'rb') as f:
+            stat = f.read()
+        started = stat[stat.rindex(b')') + 2:].split()[19].decode('ascii')
+    except (EnvironmentError, ValueError, IndexError):
+        pass
+    return '%d:%s:%s' % (sid, tty, started)
+
+
+class SharedCapabilityCache(CapabilityCache):
+    """Cache of terminal capabilities shared by all processes of a
+    terminal session.
+
+    Entries are stored in a file in `directory`, which defaults to
+    $XDG_RUNTIME_DIR. The file is replaced atomically on update and
+    ignored when the session id, controlling tty, or session leader
+    changes. If no directory is available, the cache is not shared.
+    """
+
+    def __init__(self, ttl=None, directory=None):
+        CapabilityCache.__init__(self, ttl)
+        self.directory = directory or os.environ.get('XDG_RUNTIME_DIR', '')
+        self.session = _session()
+        self.loaded = False
+
+    def now(self):
+        """Return the current time used for expiry."""
+        # Monotonic clocks are not comparable across processes
+        # pylint: disable=import-outside-toplevel
+        from time import time
+        return time()
+
+    @property
+    def path(self):
+        """The path of the cache file, or None if not shared."""
+        if self.directory:
+            return os.path.join(self.directory,
+                'term-%d.cache' % os.getsid(0))
+        return None
+
+    def _loadfile(self):
+        """Return the entries stored in the cache file."""
+        # pylint: disable=import-outside-toplevel
+        import json
+
+        entries = {}
+        try:
+            with open(self.path, 'rt') as f:
+                data = json.load(f)
+            if data.get('session') == self.session:
+                for device, termname, what, value, expires in data['entries']:
+                    if isinstance(value, list):
+                        value = tuple(value)
+                    entries[(device, termname, what)] = (value, expires)
+        except (EnvironmentError, TypeError, ValueError, KeyError, AttributeError):
+            pass
+        return entries
+
+    def _savefile(self):
+        """Atomically replace the cache file with the current entries."""
+        # pylint: disable=import-outside-toplevel
+        import json
+        import tempfile
+
+        data = {
+            'session': self.session,
+            'entries': [k + v for k, v in self.entries.items()],
+        }
+        try:
+            fd, tmp = tempfile.mkstemp(prefix='.term-', dir=self.directory)
+            try:
+                with os.fdopen(fd, 'wt') as f:
+                    json.dump(data, f)
+                os.rename(tmp, self.path)
+            except:
+                os.unlink(tmp)
+                raise
+        except EnvironmentError:
+            pass
+
+    def get(self, device, what):
+        """Return the cached value or None."""
+        if not self.loaded and self.path:
+            self.entries.update(self._loadfile())
+            self.loaded = True
+        return CapabilityCache.get(self, device, what)
+
+    def set(self, device, what, value):
+        """Store a value and write it to the cache file."""
+        self.update(device, {what: value})
+
+    def update(self, device, values):
+        """Store the values of a dictionary, keyed by capability name,
+        and write them to the cache file at once.
+        """
+        CapabilityCache.update(self, device, values)
+        if self.path:
+            # Merge with entries written by other processes
+            entries = self._loadfile()
+            entries.update(self.entries)
+            self.entries = entries
+            self.loaded = True
+            self._savefile()
+
+    def invalidate(self, *whats):
+        """Remove entries for capabilities `whats`, or all entries
+        if no names are given, and update the cache file.
+
+        Calls the refresh hooks with `whats` afterwards.
+        """
+        if self.path:
+            self.entries.update(self._loadfile())
+            self.loaded = True
+        CapabilityCache.invalidate(self, *whats)
+        if self.path:
+            self._savefile()
+
+
+# The capability cache, None if disabled.
+_cache = None
+
+
+def enablecache(ttl=None, shared=False):
+    """Enable the capability cache and return it.
+
+    Cached are the results of getnumcolors, getfgcolor, and getbgcolor,
+    as well as other cacheable queries. Entries expire after `ttl`
+    seconds, or never if `ttl` is None.
+    If `shared` is true, the cache is shared by all processes of the
+    terminal session. See :class:`SharedCapabilityCache`.
+    """
+    global _cache # pylint: disable=global-statement
+    if shared:
+        _cache = SharedCapabilityCache(ttl)
+    else:
+        _cache = CapabilityCache(ttl)
+    return _cache
+
+
+def disablecache():
+    """Disable and discard the capability cache."""
+    global _cache # pylint: disable=global-statement
+    _cache = None
+
+
+def invalidatecache(*whats):
+    """Remove capabilities `whats` from the cache, or all capabilities
+    if no names are given.
+
+    Call with 'fgcolor' and 'bgcolor' when the terminal reports a
+    palette change.
+    """
+    if _cache is not None:
+        _cache.invalidate(*whats)
+
+
+def _cachelookup(device, names):
+    """Look up names in the capability cache.
+
+    Returns a dictionary of cached results and a list of missing names.
+    """
+    results = {}
+    missing = []
+    for x in names:
+        if x in results or x in missing:
+            continue
+        value = None
+        if _cache is not None and x in _cacheable:
+            value = _cache.get(device, x)
+        if value is None:
+            missing.append(x)
+        else:
+            results[x] = value
+    return results, missing
+
+
+def _cachestore(device, results):
+    """Store cacheable results in the capability cache."""
+    if _cache is not None:
+        values = dict((x, v) for x, v in results.items() if x in _cacheable)
+        if values:
+            _cache.update(device, values)
+
+
+class Terminal(object):
+    """A terminal session connected to /dev/tty.
+
+    The device is opened and put in cbreak mode once, and stays
+    that way until the session is closed. Queries cost a single
+    write and read. The saved mode is restored on close.
+
+    If the device cannot be opened, all queries return their
+    defaults.
+    """
+
+    def __init__(self, device=None):
+        self.device = device or opentty.device
+        self.tty = None
+        self.savedmode = None
+        self._mode = None
+        self.open()
+
+    def open(self):
+        """Open the device and enter cbreak mode.
+
+        Does nothing if the session is already open.
+        """
+        if self.tty is not None:
+            return
+        t = _lap(None, None)
+        try:
+            tty = _opentty(self.device, 0)
+        except EnvironmentError:
+            return
+        t = _lap('open', t)
+        mode = cbreakmode(tty, TCSANOW, min=0, time=_vtime())
+        try:
+            mode.__enter__() # pylint: disable=unnecessary-dunder-call
+        except:
+            tty.close()
+            raise
+        _lap('mode', t)
+        self.tty = tty
+        self.savedmode = mode.savedmode
+        self._mode = mode
+
+    def close(self):
+        """Restore the saved mode and close the device."""
+        if self.tty is not None:
+            t = _lap(None, None)
+            try:
+                self._mode.__exit__()
+                _lap('restore', t)
+            finally:
+                self.tty.close()
+                self.tty = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *ignored):
+        self.close()
+
+    def __del__(self):
+        if self.tty is not None:
+            self.close()
+
+    def query(self, *names):
+        """Query the terminal for one or more registered values.
+
+        See :func:`query`.
+        """
+        results, missing = _cachelookup(self.device, names)
+        if missing and self.tty is not None:
+            start = _lap(None, None)
+            typeahead = bytearray()
+            link = _link(self.device)
+            answered = _query(self.tty, missing, typeahead, _timeout(link), link)
+            _lap('total', start)
+            _savetypeahead(self.device, typeahead)
+            _cachestore(self.device, answered)
+            results.update(answered)
+        return _results(names, results)
+
+    def readtypeahead(self):
+        """Return and clear the input read during queries.
+
+        See :func:`readtypeahead`.
+        """
+        return readtypeahead(self.device)
+
+    def getyx(self):
+        """Return the cursor position as 1-based (line, col) tuple."""
+        return self.query('yx')[0]
+
+    def getfgcolor(self):
+        """Return the terminal foreground color as (r, g, b) tuple."""
+        return self.query('fgcolor')[0]
+
+    def getbgcolor(self):
+        """Return the terminal background color as (r, g, b) tuple."""
+        return self.query('bgcolor')[0]
+
+    def getpalette(self, count=16):
+        """Return the first `count` palette colors as flat array of
+        r, g, b values.
+
+        See :func:`getpalette`.
+        """
+        return _palettearray(self.query(*_palettequeries(count)))
+
+    def islightmode(self):
+        """Return true if the background color is lighter than the foreground color."""
+        bgcolor, fgcolor = self.query('bgcolor', 'fgcolor')
+        if bgcolor[0] >= 0 and fgcolor[0] >= 0:
+            return luminance(bgcolor) > luminance(fgcolor)
+
+    def isdarkmode(self):
+        """Return true if the background color is darker than the foreground color."""
+        bgcolor, fgcolor = self.query('bgcolor', 'fgcolor')
+        if bgcolor[0] >= 0 and fgcolor[0] >= 0:
+            return luminance(bgcolor) < luminance(fgcolor)
+
+    def getnumcolors(self):
+        """Return the number of colors supported by the terminal."""
+        results, missing = _cachelookup(self.device, ('numcolors',))
+        if missing:
+            colors = _getnumcolors(self.tty)
+            if colors is not None:
+                results['numcolors'] = colors
+                _cachestore(self.device, results)
+        return results.get('numcolors', 0)
+
+    def getsize(self):
+        """Return the terminal size as (lines, cols) tuple."""
+        return self._getsize()[:2]
+
+    def getpixelsize(self):
+        """Return the size of the text area in pixels as (height, width) tuple."""
+        return self._getsize()[2:]
+
+    def _getsize(self):
+        if self.tty is None:
+            return _cachedsize(self.device) or (0, 0, 0, 0)
+        return _getsize(self.device, self.tty)
+
+
+# Submodules imported on first attribute access.
+_submodules = ('aio', 'colors', 'cursor', 'mux', 'parser', 'resolver', 'terminfo', 'testing',
+               'width')
+
+
+def __getattr__(attr):
+    """Import submodules on first access (Python 3.7+)."""
+    if attr in _submodules:
+        # pylint: disable=import-outside-toplevel
+        import importlib
+        return importlib.import_module(__name__ + '.' + attr)
+    raise AttributeError('module %r has no attribute %r' % (__name__, attr))
+
+
 # Help autosphinx's autoattribute find the constants...
 class term:
     # pylint: disable=too-few-public-methods
@@ -6,6 +6,7 @@ import term
 
 
 if __name__ == '__main__':
+    print('term.query', term.query('yx', 'fgcolor', 'bgcolor'))
     print('term.getyx', term.getyx())
     print('term.getyx_stdin_stdout', term.getyx_stdin_stdout())
     print('term.getfgcolor', term.getfgcolor())
@@ -0,0 +1,195 @@
+"""Asyncio versions of the term queries.
+
+Requires Python 3.7 or later.
+"""
+
+import os
+import asyncio
+import weakref
+
+from termios import tcgetattr, tcsetattr, TCSANOW
+
+from term import setcbreak, opentty, luminance
+from term import _queries, _scanreplies, _results, _BUFSIZE
+from term import _savetypeahead, _addleftover
+from term import _link, _timeout, _stale, _settle, _pending, _monotonic
+from term import _cachelookup, _cachestore, _palettequeries, _palettearray
+
+__all__ = ["query", "getyx", "getfgcolor", "getbgcolor", "getpalette",
+           "islightmode", "isdarkmode"]
+
+
+# Query locks of each event loop, device -> asyncio.Lock.
+_locks = weakref.WeakKeyDictionary()
+
+
+def _lock(loop, device):
+    """Return the lock serializing queries to device."""
+    locks = _locks.setdefault(loop, {})
+    lock = locks.get(device)
+    if lock is None:
+        lock = locks[device] = asyncio.Lock()
+    return lock
+
+
+async def _readable(loop, fd):
+    """Wait until fd becomes readable."""
+    fut = loop.create_future()
+
+    def ready():
+        if not fut.done():
+            fut.set_result(None)
+
+    loop.add_reader(fd, ready)
+    try:
+        await fut
+    finally:
+        loop.remove_reader(fd)
+
+
+async def _writable(loop, fd):
+    """Wait until fd becomes writable."""
+    fut = loop.create_future()
+
+    def ready():
+        if not fut.done():
+            fut.set_result(None)
+
+    loop.add_writer(fd, ready)
+    try:
+        await fut
+    finally:
+        loop.remove_writer(fd)
+
+
+async def _query(loop, fd, data, pending, results, typeahead):
+    """Write data to fd, then read and match the replies to pending."""
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    while data:
+        try:
+            data = data[os.write(fd, data):]
+        except BlockingIOError:
+            await _writable(loop, fd)
+
+    buf = b''
+    while 'da1' in pending:
+        await _readable(loop, fd)
+        try:
+            c = os.read(fd, _BUFSIZE)
+        except BlockingIOError:
+            continue
+        if not c:
+            break
+        buf = _scanreplies(buf + c, pending, results, typeahead)
+    _addleftover(typeahead, buf)
+
+
+async def query(*names):
+    """Query the terminal for one or more registered values.
+
+    Like :func:`term.query` but waits for the replies without blocking
+    the event loop. Gives up after :attr:`term.TIMEOUT`, or the adaptive
+    timeout if enabled; queries still pending at that point return
+    their defaults.
+    The coroutine may be cancelled at any time, in which case the
+    terminal mode is restored before the cancellation propagates.
+    Input the user types meanwhile is kept for :func:`term.readtypeahead`.
+
+    Concurrent queries to the same device wait for each other.
+    """
+    results, missing = _cachelookup(opentty.device, names)
+    if not missing:
+        return _results(names, results)
+    loop = asyncio.get_running_loop()
+    async with _lock(loop, opentty.device):
+        return await _locked(loop, names)
+
+
+async def _locked(loop, names):
+    """Query the terminal while holding the device lock."""
+    # Earlier queries may have stored results meanwhile
+    results, missing = _cachelookup(opentty.device, names)
+    if not missing:
+        return _results(names, results)
+    try:
+        fd = os.open(opentty.device, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    except OSError:
+        return _results(names, results)
+    answered = {}
+    typeahead = bytearray()
+    link = _link(opentty.device)
+    stale = _stale(link)
+    pending = _pending(missing, stale)
+    data = b''.join(_queries[x][0] for x in pending[stale:])
+    try:
+        savedmode = tcgetattr(fd)
+        setcbreak(fd, TCSANOW, min=1, time=0)
+        sent = _monotonic()
+        try:
+            await asyncio.wait_for(
+                _query(loop, fd, data, pending, answered, typeahead),
+                _timeout(link))
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            _settle(link, sent, stale, pending.count('da1'))
+            tcsetattr(fd, TCSANOW, savedmode)
+    finally:
+        os.close(fd)
+    _savetypeahead(opentty.device, typeahead)
+    _cachestore(opentty.device, answered)
+    results.update(answered)
+    return _results(names, results)
+
+
+async def getyx():
+    """Return the cursor position as 1-based (line, col) tuple.
+
+    See :func:`term.getyx`.
+    """
+    return (await query('yx'))[0]
+
+
+async def getfgcolor():
+    """Return the terminal foreground color as (r, g, b) tuple.
+
+    See :func:`term.getfgcolor`.
+    """
+    return (await query('fgcolor'))[0]
+
+
+async def getbgcolor():
+    """Return the terminal background color as (r, g, b) tuple.
+
+    See :func:`term.getbgcolor`.
+    """
+    return (await query('bgcolor'))[0]
+
+
+async def getpalette(count=16):
+    """Return the first `count` palette colors as flat array of
+    r, g, b values.
+
+    See :func:`term.getpalette`.
+    """
+    return _palettearray(await query(*_palettequeries(count)))
+
+
+async def islightmode():
+    """Return true if the background color is lighter than the foreground color.
+
+    See :func:`term.islightmode`.
+    """
+    bgcolor, fgcolor = await query('bgcolor', 'fgcolor')
+    if bgcolor[0] >= 0 and fgcolor[0] >= 0:
+        return luminance(bgcolor) > luminance(fgcolor)
+
+
+async def isdarkmode():
+    """Return true if the background color is darker than the foreground color.
+
+    See :func:`term.isdarkmode`.
+    """
+    bgcolor, fgcolor = await query('bgcolor', 'fgcolor')
+    if bgcolor[0] >= 0 and fgcolor[0] >= 0:
+        return luminance(bgcolor) < luminance(fgcolor)
@@ -0,0 +1,264 @@
+"""Batch color quantization, luminance, and contrast.
+
+Colors are packed 24-bit integers, 0xRRGGBB, passed as sequences or,
+if NumPy is installed, as integer arrays. Functions process a whole
+sequence per call with precomputed lookup tables; NumPy arrays are
+processed without Python loops.
+
+Example::
+
+    from term.colors import Quantizer, pack
+
+    quantizer = Quantizer.fromterminal()
+    indexes = quantizer.quantize(pack(rgbs))
+    ratios = quantizer.contrast(pack(rgbs))
+"""
+
+from array import array
+
+import term
+
+from term import _queries, _palettequeries, _scale
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ["Quantizer", "pack", "unpack", "luminances",
+           "relativeluminances", "contrastratios", "XTERM_PALETTE"]
+
+# The 16 ANSI colors of xterm.
+_ANSI = (0x000000, 0xcd0000, 0x00cd00, 0xcdcd00, 0x0000ee, 0xcd00cd, 0x00cdcd, 0xe5e5e5,
+         0x7f7f7f, 0xff0000, 0x00ff00, 0xffff00, 0x5c5cff, 0xff00ff, 0x00ffff, 0xffffff)
+
+# Levels of the 6x6x6 color cube and the 24 gray levels.
+_CUBE = (0, 95, 135, 175, 215, 255)
+_GRAYS = tuple(8 + 10 * i for i in range(24))
+
+# The default 256-color palette of xterm, as packed colors.
+XTERM_PALETTE = _ANSI + tuple(
+    r << 16 | g << 8 | b for r in _CUBE for g in _CUBE for b in _CUBE) + tuple(
+    v << 16 | v << 8 | v for v in _GRAYS)
+
+
+def _nearestlevel(levels):
+    """Return a table mapping 0-255 to the index of the nearest level."""
+    return bytearray(min((abs(level - v), i) for i, level in enumerate(levels))[1]
+                     for v in range(256))
+
+
+# Channel value -> nearest cube level, mean value -> nearest gray.
+_CUBELEVEL = _nearestlevel(_CUBE)
+_GRAYLEVEL = _nearestlevel(_GRAYS)
+
+# Channel value -> weighted square, for luminance.
+_HSP = tuple(tuple(w * v * v for v in range(256)) for w in (0.299, 0.587, 0.114))
+
+# Channel value -> weighted linear sRGB value, for relative luminance.
+_LINEAR = tuple(tuple(w * (c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4)
+                      for c in (v / 255.0 for v in range(256)))
+                for w in (0.2126, 0.7152, 0.0722))
+
+# Maximum number of colors remembered by a Quantizer.
+_MEMOMAX = 1 << 16
+
+# Colors processed at once with NumPy.
+_CHUNK = 1 << 16
+
+
+def _isarray(colors):
+    return numpy is not None and isinstance(colors, numpy.ndarray)
+
+
+def pack(rgbs):
+    """Return (r, g, b) tuples of 8-bit values as array of packed colors."""
+    return array('i', [r << 16 | g << 8 | b for r, g, b in rgbs])
+
+
+def unpack(colors):
+    """Return packed colors as list of (r, g, b) tuples."""
+    return [(c >> 16 & 255, c >> 8 & 255, c & 255) for c in colors]
+
+
+def luminances(colors):
+    """Return the perceived brightness of colors, 0 to 255.
+
+    Like :func:`term.luminance`, for 8-bit channels.
+    """
+    r, g, b = _HSP
+    if _isarray(colors):
+        c = colors.astype('i8')
+        r, g, b = (numpy.array(x) for x in _HSP)
+        return numpy.sqrt(r[c >> 16 & 255] + g[c >> 8 & 255] + b[c & 255])
+    return array('d', [(r[c >> 16 & 255] + g[c >> 8 & 255] + b[c & 255]) ** 0.5
+                       for c in colors])
+
+
+def relativeluminances(colors):
+    """Return the relative luminance of colors as defined by WCAG 2,
+    0 to 1.
+    """
+    r, g, b = _LINEAR
+    if _isarray(colors):
+        c = colors.astype('i8')
+        r, g, b = (numpy.array(x) for x in _LINEAR)
+        return r[c >> 16 & 255] + g[c >> 8 & 255] + b[c & 255]
+    return array('d', [r[c >> 16 & 255] + g[c >> 8 & 255] + b[c & 255] for c in colors])
+
+
+def contrastratios(colors, background):
+    """Return the WCAG 2 contrast ratios of colors against the packed
+    `background` color, 1 to 21.
+    """
+    bg = relativeluminances([background])[0] + 0.05
+    lums = relativeluminances(colors)
+    if _isarray(lums):
+        lums = lums + 0.05
+        return numpy.maximum(lums, bg) / numpy.minimum(lums, bg)
+    return array('d', [(l + 0.05) / bg if l + 0.05 > bg else bg / (l + 0.05) for l in lums])
+
+
+class _Memo(dict):
+    """Palette indexes of colors, computed on first lookup."""
+
+    def __init__(self, nearest):
+        dict.__init__(self)
+        self.nearest = nearest
+
+    def __missing__(self, color):
+        if len(self) >= _MEMOMAX:
+            self.clear()
+        index = self[color] = self.nearest(color)
+        return index
+
+
+class Quantizer(object):
+    """Map truecolor values to the nearest palette colors.
+
+    `numcolors` is 8, 16, or 256; other values are rounded down, to at
+    least 8. `palette` is a sequence of packed colors which replaces the
+    start of :data:`XTERM_PALETTE`, e.g. the colors reported by the
+    terminal. `background` is the packed background color used by
+    :meth:`contrast`; it defaults to black.
+
+    Nearest colors are found by squared RGB distance. With 256 colors,
+    the candidates are the 16 ANSI colors and the nearest cube and gray
+    entries. Results are remembered per color.
+    """
+
+    def __init__(self, numcolors=256, palette=None, background=None):
+        self.numcolors = _supported(numcolors)
+        colors = list(XTERM_PALETTE[:self.numcolors])
+        if palette is not None:
+            palette = list(palette)[:self.numcolors]
+            colors[:len(palette)] = palette
+        self.palette = array('i', colors)
+        self.background = background if background is not None else 0
+        self._rgb = unpack(self.palette)
+        self._memo = _Memo(self._nearest)
+
+    @classmethod
+    def fromterminal(cls, numcolors=None, terminal=None):
+        """Return a Quantizer for the palette and background color of
+        the terminal.
+
+        `numcolors` defaults to :func:`term.getnumcolors`. Pass a
+        :class:`term.Terminal` to use its session. Colors the terminal
+        does not report keep their xterm defaults.
+        """
+        source = terminal if terminal is not None else term
+        if numcolors is None:
+            numcolors = source.getnumcolors()
+        numcolors = _supported(numcolors)
+        # Palette and background are read in a single round trip
+        values = source.query(*_palettequeries(numcolors) + ('bgcolor16',))
+        palette = list(XTERM_PALETTE[:numcolors])
+        for i, rgb in enumerate(values[:numcolors]):
+            if rgb[0] >= 0:
+                palette[i] = _pack16(rgb)
+        background = None
+        if values[-1][0] >= 0:
+            background = _pack16(values[-1])
+        return cls(numcolors, palette, background)
+
+    def _candidates(self, r, g, b):
+        if self.numcolors < 256:
+            return range(self.numcolors)
+        cube = 16 + 36 * _CUBELEVEL[r] + 6 * _CUBELEVEL[g] + _CUBELEVEL[b]
+        gray = 232 + _GRAYLEVEL[(r + g + b) // 3]
+        return list(range(16)) + [cube, gray]
+
+    def _nearest(self, color):
+        r, g, b = color >> 16 & 255, color >> 8 & 255, color & 255
+        rgb = self._rgb
+        best = bestdist = None
+        for i in self._candidates(r, g, b):
+            pr, pg, pb = rgb[i]
+            dist = (pr - r) ** 2 + (pg - g) ** 2 + (pb - b) ** 2
+            if best is None or dist < bestdist:
+                best, bestdist = i, dist
+        return best
+
+    def quantize(self, colors):
+        """Return the palette indexes of the nearest colors.
+
+        Returns an array of bytes, or a NumPy array for NumPy input.
+        """
+        if _isarray(colors):
+            return self._npquantize(colors)
+        return array('B', map(self._memo.__getitem__, colors))
+
+    def _npquantize(self, colors):
+        # pylint: disable=too-many-locals
+        unique, inverse = numpy.unique(colors.astype('i8').ravel(), return_inverse=True)
+        palette = numpy.array(self._rgb, dtype='i8')
+        cubelevel = numpy.frombuffer(bytes(_CUBELEVEL), dtype='u1').astype('i8')
+        graylevel = numpy.frombuffer(bytes(_GRAYLEVEL), dtype='u1').astype('i8')
+        indexes = numpy.empty(len(unique), dtype='u1')
+        for start in range(0, len(unique), _CHUNK):
+            c = unique[start:start+_CHUNK]
+            rgb = numpy.stack((c >> 16 & 255, c >> 8 & 255, c & 255), axis=1)
+            candidates = numpy.broadcast_to(numpy.arange(min(self.numcolors, 16)),
+                                            (len(c), min(self.numcolors, 16)))
+            if self.numcolors >= 256:
+                cube = (16 + 36 * cubelevel[rgb[:, 0]] + 6 * cubelevel[rgb[:, 1]] +
+                        cubelevel[rgb[:, 2]])
+                gray = 232 + graylevel[rgb.sum(axis=1) // 3]
+                candidates = numpy.concatenate((candidates, cube[:, None], gray[:, None]), axis=1)
+            dist = ((palette[candidates] - rgb[:, None, :]) ** 2).sum(axis=2)
+            best = candidates[numpy.arange(len(c)), dist.argmin(axis=1)]
+            indexes[start:start+_CHUNK] = best
+        return indexes[inverse].reshape(colors.shape)
+
+    def colors(self, indexes):
+        """Return the packed palette colors of indexes."""
+        if _isarray(indexes):
+            return numpy.array(self.palette, dtype='i4')[indexes]
+        palette = self.palette
+        return array('i', [palette[i] for i in indexes])
+
+    def contrast(self, colors):
+        """Return the contrast ratios of colors against the background."""
+        return contrastratios(colors, self.background)
+
+
+def _supported(numcolors):
+    """Round numcolors down to 8, 16, or 256."""
+    return 256 if numcolors >= 256 else 16 if numcolors >= 16 else 8
+
+
+def _bgcolor16(m):
+    """Scale the channels of an OSC 11 reply to 16 bits."""
+    return tuple(_scale(x) for x in m.groups())
+
+
+# The background color, scaled like palette colors. Uses the request
+# and reply pattern of 'bgcolor', which returns the digits unscaled.
+term.registerquery('bgcolor16', _queries['bgcolor'][0], _queries['bgcolor'][1],
+                   _bgcolor16, (-1, -1, -1), cache=True)
+
+
+def _pack16(rgb):
+    """Pack a color with 16-bit channels."""
+    return (rgb[0] >> 8) << 16 | (rgb[1] >> 8) << 8 | rgb[2] >> 8
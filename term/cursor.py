@@ -0,0 +1,255 @@
+"""Shadow cursor which follows the output written to the terminal.
+
+Example::
+
+    from term.cursor import Cursor
+
+    cursor = Cursor(interval=5)
+    data = b'$ prompt '
+    sys.stdout.buffer.write(data)
+    cursor.feed(data)
+    line, col = cursor.getyx()  # No I/O most of the time
+"""
+
+from term import getyx, getsize, _monotonic
+from term.parser import Parser, Text, Control, Esc, CSI
+
+__all__ = ["Cursor"]
+
+# Final bytes of CSI sequences which do not move the cursor.
+_STILL = b'@JKPSTXcmnpqt'
+
+# DEC private modes which switch screens.
+_SCREENMODES = set([b'47', b'1047', b'1049'])
+
+# DEC private modes which are not modeled: origin mode, no autowrap.
+_UNMODELED = {b'h': b'6', b'l': b'7'}
+
+
+def _size():
+    """Return the terminal size as (lines, cols) tuple."""
+    lines, cols = getsize()
+    if lines and cols:
+        return lines, cols
+    return 24, 80
+
+
+def _int(params, default=1):
+    """Return the first CSI parameter as int."""
+    p = params.split(b';')[0]
+    return int(p) if p.isdigit() and int(p) > 0 else default
+
+
+def _privatemodes(params):
+    """Return the DEC private modes set or reset by a CSI sequence."""
+    if params.startswith(b'?'):
+        return params[1:].split(b';')
+    return []
+
+
+class Cursor(object):
+    """A local model of the cursor position.
+
+    Feed it the output written to the terminal. It follows printable
+    text, control characters, line wrapping at the terminal width, and
+    the common cursor movement sequences, and answers :meth:`getyx`
+    without I/O.
+
+    The position is synchronized with the terminal by a DSR 6 query
+    when the model is uncertain, e.g. after non-ASCII text or an
+    unknown sequence, and every `interval` seconds if given. `size`
+    defaults to the size of the terminal, `query` to :func:`term.getyx`.
+
+    `onlcr` tells whether the tty turns newlines into CR LF, like it
+    does unless output processing is off. Pass False for output written
+    in raw mode.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, size=None, interval=None, query=None, onlcr=True):
+        self.size = size or _size()
+        self.interval = interval
+        self.query = query or getyx
+        self.onlcr = onlcr
+        self.yx = (1, 1)
+        self.uncertain = True
+        self.syncs = 0
+        self._synced = _monotonic()
+        self._wrap = False
+        self._saved = None
+        self._unmodeled = set()
+        self._parser = Parser()
+
+    def sync(self):
+        """Query the terminal for the cursor position.
+
+        Returns true if the terminal answered.
+        """
+        self.syncs += 1
+        self._synced = _monotonic()
+        yx = self.query()
+        if yx[0] > 0:
+            self.yx = yx
+            self.uncertain = bool(self._unmodeled)
+            self._wrap = False
+            return True
+        return False
+
+    def getyx(self):
+        """Return the cursor position as 1-based (line, col) tuple.
+
+        Synchronizes with the terminal first if the model is uncertain
+        or the interval has passed.
+        """
+        if self.uncertain or (self.interval is not None and
+                              _monotonic() - self._synced >= self.interval):
+            self.sync()
+        return self.yx
+
+    def moveto(self, line, col):
+        """Set the position, e.g. after moving the cursor by other means.
+        The position becomes certain.
+        """
+        self._moveto(line, col)
+        self.uncertain = bool(self._unmodeled)
+
+    def _moveto(self, line, col):
+        lines, cols = self.size
+        self.yx = (min(max(line, 1), lines), min(max(col, 1), cols))
+        self._wrap = False
+
+    def resize(self, size):
+        """Set the terminal size. The position becomes uncertain."""
+        self.size = size
+        self.uncertain = True
+
+    def feed(self, data):
+        """Update the position from data written to the terminal."""
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = data.encode('utf-8')
+        for event in self._parser.feed(data):
+            if isinstance(event, Text):
+                self._text(event.data)
+            elif isinstance(event, Control):
+                self._control(event.code)
+            elif isinstance(event, CSI):
+                self._csi(event)
+            elif isinstance(event, Esc):
+                self._esc(event)
+
+    def _text(self, data):
+        try:
+            n = len(bytes(data).decode('ascii'))
+        except UnicodeDecodeError:
+            # Widths of non-ASCII text are unknown
+            self.uncertain = True
+            return
+        line, col = self.yx
+        lines, cols = self.size
+        while n:
+            if self._wrap:
+                line = min(line + 1, lines)
+                col = 1
+                self._wrap = False
+            step = min(n, cols - col + 1)
+            col += step
+            n -= step
+            if col > cols:
+                col = cols
+                self._wrap = True
+        self.yx = (line, col)
+
+    def _control(self, code):
+        line, col = self.yx
+        if code == b'\r':
+            self._moveto(line, 1)
+        elif code == b'\n' and self.onlcr:
+            self._moveto(line + 1, 1)
+        elif code in (b'\n', b'\x0b', b'\x0c'):
+            self._moveto(line + 1, col)
+        elif code == b'\b':
+            self._moveto(line, col - 1)
+        elif code == b'\t':
+            self._moveto(line, (col - 1) // 8 * 8 + 9)
+
+    def _csi(self, event):
+        # pylint: disable=too-many-branches
+        params, final = event.params, event.final
+        line, col = self.yx
+        n = _int(params)
+        if event.intermediates or params.startswith((b'<', b'=', b'>')):
+            if final not in b'mnpqc':
+                self.uncertain = True
+        elif final in b'A':
+            self._moveto(line - n, col)
+        elif final in b'Be':
+            self._moveto(line + n, col)
+        elif final in b'Ca':
+            self._moveto(line, col + n)
+        elif final in b'D':
+            self._moveto(line, col - n)
+        elif final in b'E':
+            self._moveto(line + n, 1)
+        elif final in b'F':
+            self._moveto(line - n, 1)
+        elif final in b'G`':
+            self._moveto(line, n)
+        elif final in b'd':
+            self._moveto(n, col)
+        elif final in b'Hf':
+            args = params.split(b';') + [b'']
+            self.moveto(_int(args[0]), _int(args[1]))
+        elif final in b'LM':
+            self._moveto(line, 1)
+        elif final == b's' and not params:
+            self._saved = self.yx
+        elif final == b'u' and not params:
+            self._restore()
+        elif final in b'r':
+            # Scrolling regions are not modeled
+            args = params.split(b';') + [b'']
+            bottom = _int(args[1], self.size[0])
+            self._mode(b'r', _int(args[0]) != 1 or bottom != self.size[0])
+            self.moveto(1, 1)
+        elif final in b'hl':
+            modes = _privatemodes(params)
+            for mode in modes:
+                if mode in (b'6', b'7'):
+                    self._mode(mode, _UNMODELED[final] == mode)
+            if _SCREENMODES.intersection(modes):
+                self.uncertain = True
+        elif final not in _STILL:
+            self.uncertain = True
+
+    def _esc(self, event):
+        if event.intermediates:
+            return  # Character sets, DECALN, ...
+        line, col = self.yx
+        final = event.final
+        if final == b'7':
+            self._saved = self.yx
+        elif final == b'8':
+            self._restore()
+        elif final == b'D':
+            self._moveto(line + 1, col)
+        elif final == b'E':
+            self._moveto(line + 1, 1)
+        elif final == b'M':
+            self._moveto(line - 1, col)
+        elif final == b'c':
+            self._unmodeled.clear()
+            self.moveto(1, 1)
+
+    def _mode(self, mode, unmodeled):
+        if unmodeled:
+            self._unmodeled.add(mode)
+            self.uncertain = True
+        else:
+            self._unmodeled.discard(mode)
+
+    def _restore(self):
+        if self._saved is not None:
+            self._moveto(*self._saved)
+        else:
+            self._moveto(1, 1)
@@ -0,0 +1,198 @@
+"""Query many terminals at once.
+
+Example::
+
+    from term.mux import Multiplexer
+
+    mux = Multiplexer(timeout=0.5)
+    for fd, (yx, bgcolor) in mux.query(fds, 'yx', 'bgcolor').items():
+        print(fd, yx, bgcolor)
+
+The fds are connected to terminals, e.g. pty slaves or tty devices.
+Queries are written to all fds, and replies are collected in a single
+epoll loop, or poll loop where epoll is not available.
+"""
+
+import os
+import errno
+import fcntl
+import select
+
+from termios import error
+
+import term
+
+from term import tcgetattr, tcsetattr, TCSANOW, _cbreakmode, _fileno
+from term import _queries, _scanreplies, _results, _addleftover, _pending
+from term import _monotonic, _count, _BUFSIZE
+
+__all__ = ["Multiplexer", "query"]
+
+_IN = select.POLLIN
+_OUT = select.POLLOUT
+_ERR = select.POLLERR | select.POLLHUP | getattr(select, 'POLLNVAL', 0)
+
+
+class _poller(object):
+    """epoll or poll object with a timeout in seconds."""
+
+    def __init__(self):
+        if hasattr(select, 'epoll'):
+            self._poll = select.epoll()
+            self._scale = 1
+        else:
+            self._poll = select.poll()
+            self._scale = 1000
+        self.register = self._poll.register
+        self.modify = self._poll.modify
+        self.unregister = self._poll.unregister
+
+    def poll(self, timeout):
+        return self._poll.poll(timeout * self._scale)
+
+    def close(self):
+        if hasattr(self._poll, 'close'):
+            self._poll.close()
+
+
+class _session(object):
+    """Query state of an fd."""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, fd, names):
+        self.fd = fd
+        self.pending = _pending(names)
+        self.data = b''.join(_queries[x][0] for x in self.pending)
+        self.results = {}
+        self.typeahead = bytearray()
+        self.buf = b''
+        self.flags = None
+        self.savedmode = None
+
+    def setup(self):
+        """Enter non-blocking cbreak mode."""
+        self.flags = fcntl.fcntl(self.fd, fcntl.F_GETFL)
+        fcntl.fcntl(self.fd, fcntl.F_SETFL, self.flags | os.O_NONBLOCK)
+        try:
+            self.savedmode = tcgetattr(self.fd)
+        except error:
+            return # Not a tty
+        tcsetattr(self.fd, TCSANOW, _cbreakmode(self.savedmode, 1, 0))
+
+    def restore(self):
+        """Restore the saved mode and flags."""
+        try:
+            if self.savedmode is not None:
+                tcsetattr(self.fd, TCSANOW, self.savedmode)
+            if self.flags is not None:
+                fcntl.fcntl(self.fd, fcntl.F_SETFL, self.flags)
+        except (EnvironmentError, error):
+            pass
+
+    def write(self):
+        """Write pending queries. Returns true when done."""
+        self.data = self.data[os.write(self.fd, self.data):]
+        return not self.data
+
+    def read(self):
+        """Read and match replies. Returns true when done."""
+        c = os.read(self.fd, _BUFSIZE)
+        if not c:
+            return True
+        self.buf = _scanreplies(self.buf + c, self.pending, self.results, self.typeahead)
+        return 'da1' not in self.pending
+
+
+class Multiplexer(object):
+    """Query many terminals at once.
+
+    Each call to :meth:`query` writes the queries to all fds and waits
+    for the replies in a single loop, giving up after `timeout`
+    seconds. `timeout` defaults to :attr:`term.TIMEOUT`.
+
+    Input that is not a reply is kept per fd in :attr:`typeahead`.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.typeahead = {}
+
+    def query(self, fds, *names):
+        """Query the terminals connected to fds for one or more
+        registered values.
+
+        Returns a dictionary mapping each fd to a tuple of results in
+        the order of `names`. Like with :func:`term.query`, a result is
+        its query's default if the terminal does not reply in time.
+        """
+        timeout = self.timeout
+        if timeout is None:
+            timeout = term.TIMEOUT / 10.0
+        sessions = {}
+        for fd in fds:
+            fd = _fileno(fd)
+            if fd not in sessions:
+                sessions[fd] = _session(fd, names)
+        poller = _poller()
+        try:
+            for s in sessions.values():
+                try:
+                    s.setup()
+                    poller.register(s.fd, _OUT | _IN)
+                except (EnvironmentError, error):
+                    s.pending = []
+            self._loop(poller, sessions, _monotonic() + timeout)
+        finally:
+            poller.close()
+            for s in sessions.values():
+                s.restore()
+        results = {}
+        for fd, s in sessions.items():
+            _addleftover(s.typeahead, s.buf)
+            if s.typeahead:
+                self.typeahead[fd] = self.typeahead.get(fd, b'') + bytes(s.typeahead)
+            _count('queries')
+            if 'da1' in s.pending:
+                _count('timeouts')
+            results[fd] = _results(names, s.results)
+        return results
+
+    def _loop(self, poller, sessions, deadline):
+        active = sum(1 for s in sessions.values() if s.pending)
+        while active:
+            timeout = deadline - _monotonic()
+            if timeout <= 0:
+                break
+            try:
+                events = poller.poll(timeout)
+            except EnvironmentError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            for fd, event in events:
+                s = sessions[fd]
+                try:
+                    if event & _OUT and s.write():
+                        poller.modify(fd, _IN)
+                    done = event & _IN and s.read() or event & _ERR
+                except EnvironmentError as e:
+                    if e.errno in (errno.EAGAIN, errno.EINTR):
+                        continue
+                    done = True
+                if done:
+                    poller.unregister(fd)
+                    active -= 1
+
+    def readtypeahead(self, fd):
+        """Return and clear the input read from fd during queries."""
+        return self.typeahead.pop(_fileno(fd), b'')
+
+
+def query(fds, *names):
+    """Query the terminals connected to fds for one or more registered
+    values.
+
+    See :meth:`Multiplexer.query`.
+    """
+    return Multiplexer().query(fds, *names)
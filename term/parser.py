@@ -0,0 +1,239 @@
+"""Incremental escape sequence parser.
+
+The parser follows the ECMA-48 / DEC VT500 state machine. It accepts
+byte chunks of any size and returns typed events. Sequences may be
+split across chunks; bytes already consumed are never scanned again.
+
+Text, OSC, and DCS payloads contained in a single chunk are returned
+as memoryview slices of the chunk, without copying. Payloads spanning
+chunks are returned as bytes. On Python 2, where regular expressions
+do not accept memoryviews, chunks are copied to a bytearray and
+payloads are bytearray slices.
+"""
+
+import re
+import sys
+
+from collections import namedtuple
+
+__all__ = ["Parser", "Text", "Control", "Esc", "CSI", "OSC", "DCS", "SS3"]
+
+# Events
+Text = namedtuple('Text', 'data')
+Control = namedtuple('Control', 'code')
+Esc = namedtuple('Esc', 'intermediates final')
+CSI = namedtuple('CSI', 'params intermediates final')
+OSC = namedtuple('OSC', 'data')
+DCS = namedtuple('DCS', 'params intermediates final data')
+SS3 = namedtuple('SS3', 'final')
+
+# States
+GROUND = 0
+ESCAPE = 1
+CSI_ENTRY = 2
+OSC_STRING = 3
+DCS_ENTRY = 4
+DCS_STRING = 5
+SS3_ENTRY = 6
+IGNORE_STRING = 7
+
+# C0 controls and ESC end text
+_TEXTEND = re.compile(b'[\x00-\x1f\x7f]')
+
+# Final bytes end CSI and DCS headers; CAN, SUB, and ESC abort them;
+# other C0 controls and DEL interrupt them
+_HEADEREND = re.compile(b'[\x00-\x1f\x40-\x7f]')
+
+# Valid CSI and DCS headers
+_HEADER = re.compile(b'([\x30-\x3f]*)([\x20-\x2f]*)$')
+
+# BEL and ESC end strings; CAN and SUB abort them
+_STRINGEND = re.compile(b'[\x07\x18\x1a\x1b]')
+
+_ESC = 0x1b
+_CAN = 0x18
+_SUB = 0x1a
+_BEL = 0x07
+_DEL = 0x7f
+
+if sys.version_info[0] >= 3:
+    _buffer = memoryview
+else:
+    # Regular expressions do not accept memoryviews, and their
+    # items are strings
+    _buffer = bytearray
+
+
+class Parser(object):
+    """Incremental escape sequence parser.
+
+    Call :meth:`feed` with chunks of bytes as they arrive. Events
+    are returned in input order.
+    """
+
+    def __init__(self):
+        self.state = GROUND
+        self.intermediates = b''
+        self.header = b''
+        self.dcs = None
+        self.parts = []
+        self.st = False
+
+    def reset(self):
+        """Return to the ground state and discard partial sequences."""
+        Parser.__init__(self)
+
+    def feed(self, data):
+        """Parse a chunk of bytes and return a list of events.
+
+        Payloads returned as memoryviews reference `data`; copy them
+        if `data` is modified later.
+        """
+        # pylint: disable=too-many-branches,too-many-statements
+        view = _buffer(data)
+        events = []
+        pos = 0
+        end = len(view)
+
+        while pos < end:
+            state = self.state
+
+            if state == GROUND:
+                m = _TEXTEND.search(view, pos)
+                if m is None:
+                    events.append(Text(view[pos:]))
+                    break
+                i = m.start()
+                if i > pos:
+                    events.append(Text(view[pos:i]))
+                c = view[i]
+                if c == _ESC:
+                    self.state = ESCAPE
+                    self.intermediates = b''
+                elif c != _DEL:
+                    events.append(Control(bytes(view[i:i+1])))
+                pos = i + 1
+
+            elif state == ESCAPE:
+                c = view[pos]
+                st, self.st = self.st, False
+                pos += 1
+                if 0x20 <= c <= 0x2f:
+                    self.intermediates += bytes(view[pos-1:pos])
+                elif self.intermediates:
+                    if 0x30 <= c <= 0x7e:
+                        events.append(Esc(self.intermediates, bytes(view[pos-1:pos])))
+                        self.state = GROUND
+                    else:
+                        pos = self._escapecontrol(c, pos, events)
+                elif c == 0x5b: # [
+                    self.state = CSI_ENTRY
+                    self.header = b''
+                elif c == 0x5d: # ]
+                    self.state = OSC_STRING
+                    self.parts = []
+                elif c == 0x50: # P
+                    self.state = DCS_ENTRY
+                    self.header = b''
+                elif c == 0x4f: # O
+                    self.state = SS3_ENTRY
+                elif c in (0x58, 0x5e, 0x5f): # SOS, PM, APC
+                    self.state = IGNORE_STRING
+                elif c == 0x5c and st: # ST ending a string
+                    self.state = GROUND
+                elif 0x30 <= c <= 0x7e:
+                    events.append(Esc(b'', bytes(view[pos-1:pos])))
+                    self.state = GROUND
+                else:
+                    pos = self._escapecontrol(c, pos, events)
+
+            elif state == SS3_ENTRY:
+                c = view[pos]
+                pos += 1
+                if 0x20 <= c <= 0x7e:
+                    events.append(SS3(bytes(view[pos-1:pos])))
+                    self.state = GROUND
+                else:
+                    self.state = GROUND
+                    pos -= 1
+
+            elif state in (CSI_ENTRY, DCS_ENTRY):
+                m = _HEADEREND.search(view, pos)
+                if m is None:
+                    self.header += bytes(view[pos:])
+                    break
+                i = m.start()
+                header = self.header + bytes(view[pos:i])
+                self.header = b''
+                pos = i + 1
+                c = view[i]
+                if c == _ESC:
+                    self.state = ESCAPE
+                    self.intermediates = b''
+                    continue
+                if c in (_CAN, _SUB):
+                    self.state = GROUND
+                    continue
+                if c < 0x20 or c == _DEL:
+                    # C0 controls are executed in CSI headers, DEL is ignored
+                    self.header = header
+                    if c != _DEL and state == CSI_ENTRY:
+                        events.append(Control(bytes(view[i:i+1])))
+                    continue
+                h = _HEADER.match(header)
+                final = bytes(view[i:i+1])
+                if state == CSI_ENTRY:
+                    self.state = GROUND
+                    if h is not None:
+                        events.append(CSI(h.group(1), h.group(2), final))
+                else:
+                    if h is not None:
+                        self.state = DCS_STRING
+                        self.dcs = (h.group(1), h.group(2), final)
+                    else:
+                        self.state = IGNORE_STRING
+                    self.parts = []
+
+            else: # OSC_STRING, DCS_STRING, IGNORE_STRING
+                m = _STRINGEND.search(view, pos)
+                if m is None:
+                    if state != IGNORE_STRING:
+                        self.parts.append(bytes(view[pos:]))
+                    break
+                i = m.start()
+                c = view[i]
+                if state != IGNORE_STRING and c in (_BEL, _ESC):
+                    if self.parts:
+                        self.parts.append(bytes(view[pos:i]))
+                        payload = b''.join(self.parts)
+                    else:
+                        payload = view[pos:i]
+                    if state == OSC_STRING:
+                        events.append(OSC(payload))
+                    else:
+                        events.append(DCS(self.dcs[0], self.dcs[1], self.dcs[2], payload))
+                self.parts = []
+                self.dcs = None
+                pos = i + 1
+                if c == _ESC:
+                    self.state = ESCAPE
+                    self.intermediates = b''
+                    self.st = True
+                else:
+                    self.state = GROUND
+
+        return events
+
+    def _escapecontrol(self, c, pos, events):
+        """Handle a non-final byte in the escape state."""
+        if c == _ESC:
+            self.intermediates = b''
+        elif c in (_CAN, _SUB):
+            self.state = GROUND
+        elif c < 0x20:
+            events.append(Control(bytes(bytearray((c,)))))
+        else:
+            # Not part of an escape sequence, e.g. UTF-8 after ESC
+            self.state = GROUND
+            pos -= 1
+        return pos
@@ -0,0 +1,147 @@
+"""Resolve terminal capabilities from the cheapest source available.
+
+Capabilities are looked up in tiers: first the environment, then the
+terminfo database, and only then the terminal itself. The first tier
+with an answer wins.
+
+Example::
+
+    from term.resolver import resolve
+
+    numcolors, tier = resolve('numcolors')  # e.g. (16777216, 'env')
+    lightmode, tier = resolve('lightmode')  # e.g. (True, 'tty')
+"""
+
+import os
+
+import term
+
+__all__ = ["resolve", "registerresolver", "ENV", "TERMINFO", "TTY", "TIERS"]
+
+# Tiers in the order they are tried.
+ENV = 'env'
+TERMINFO = 'terminfo'
+TTY = 'tty'
+TIERS = (ENV, TERMINFO, TTY)
+
+# Number of colors of direct color (truecolor) terminals.
+DIRECTCOLOR = 1 << 24
+
+# TERM_PROGRAM values of terminals with direct color support.
+_DIRECTCOLOR_PROGRAMS = set(['iTerm.app', 'vscode', 'WezTerm', 'Hyper',
+                             'ghostty', 'Tabby', 'rio'])
+
+# Registered resolvers, what -> list of (tier, func).
+_resolvers = {}
+
+# Results if no tier answers, what -> value.
+_defaults = {}
+
+
+def registerresolver(what, tier, func, default=None):
+    """Register a resolver for use with :func:`resolve`.
+
+    `func` is called without arguments and returns the value of
+    capability `what`, or None if it does not know. `tier` is one of
+    :data:`TIERS`. `default` is returned if no tier knows.
+    """
+    resolvers = _resolvers.setdefault(what, [])
+    resolvers.append((tier, func))
+    resolvers.sort(key=lambda x: TIERS.index(x[0]))
+    if default is not None or what not in _defaults:
+        _defaults[what] = default
+
+
+def resolve(what, tiers=TIERS):
+    """Return the value of capability `what` as (value, tier) tuple.
+
+    Tiers are tried in the order environment, terminfo, tty, and the
+    first answer is returned with the name of its tier. Pass `tiers`
+    to restrict the lookup, e.g. ``(ENV, TERMINFO)`` to avoid I/O.
+    If no tier knows, the result is (default, None).
+
+    Capabilities are 'numcolors', 'directcolor', and 'lightmode'.
+    """
+    for tier, func in _resolvers[what]:
+        if tier in tiers:
+            value = func()
+            if value is not None:
+                return value, tier
+    return _defaults[what], None
+
+
+def _terminfo():
+    # pylint: disable=import-outside-toplevel
+    from term.terminfo import load
+    return load(term.name())
+
+
+# numcolors
+
+def _env_numcolors():
+    # pylint: disable=too-many-return-statements
+    env = os.environ
+    if env.get('TERM') == 'dumb':
+        return 0
+    if env.get('COLORTERM', '').lower() in ('truecolor', '24bit'):
+        return DIRECTCOLOR
+    program = env.get('TERM_PROGRAM', '')
+    if program in _DIRECTCOLOR_PROGRAMS:
+        return DIRECTCOLOR
+    if program == 'Apple_Terminal':
+        return 256
+    vte = env.get('VTE_VERSION', '')
+    if vte.isdigit() and int(vte) >= 3600:
+        return DIRECTCOLOR
+    if 'KITTY_WINDOW_ID' in env or 'WT_SESSION' in env:
+        return DIRECTCOLOR
+    return None
+
+
+def _terminfo_numcolors():
+    entry = _terminfo()
+    if entry is not None:
+        if entry.getflag('Tc') or entry.getflag('RGB'):
+            return DIRECTCOLOR
+        return max(entry.getnum('colors'), 0)
+    return None
+
+
+registerresolver('numcolors', ENV, _env_numcolors, 0)
+registerresolver('numcolors', TERMINFO, _terminfo_numcolors)
+
+
+# directcolor
+
+def _env_directcolor():
+    numcolors = _env_numcolors()
+    if numcolors is not None:
+        return numcolors >= DIRECTCOLOR
+    return None
+
+
+def _terminfo_directcolor():
+    numcolors = _terminfo_numcolors()
+    if numcolors is not None:
+        return numcolors >= DIRECTCOLOR
+    return None
+
+
+registerresolver('directcolor', ENV, _env_directcolor, False)
+registerresolver('directcolor', TERMINFO, _terminfo_directcolor)
+
+
+# lightmode
+
+def _env_lightmode():
+    # COLORFGBG is 'fg;bg' or 'fg;default;bg' with ANSI color numbers
+    bg = os.environ.get('COLORFGBG', '').split(';')[-1]
+    if bg.isdigit():
+        bg = int(bg)
+        if 0 <= bg <= 15:
+            return bg in (7, 15) or 9 <= bg <= 14
+    return None
+
+
+registerresolver('lightmode', ENV, _env_lightmode)
+registerresolver('lightmode', TTY, term.islightmode)
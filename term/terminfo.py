@@ -0,0 +1,309 @@
+"""Pure-Python reader for compiled terminfo entries.
+
+Reads the legacy and the extended-number (32-bit) binary formats
+described in term(5), including user-defined capabilities. Entries
+are located like ncurses does, parsed once, and cached.
+
+Example::
+
+    from term.terminfo import load
+
+    entry = load('xterm-256color')
+    if entry is not None:
+        colors = entry.getnum('colors')
+"""
+
+import os
+import mmap
+import struct
+
+__all__ = ["Terminfo", "load", "find", "parse", "clearcache"]
+
+# Magic numbers of the legacy and the 32-bit number formats.
+MAGIC = 0o432
+MAGIC32 = 0o1036
+
+# Absent and cancelled capabilities.
+_ABSENT = -1
+_CANCELLED = -2
+
+# Directories searched after TERMINFO, ~/.terminfo, and TERMINFO_DIRS.
+SYSTEM_DIRS = ('/etc/terminfo', '/lib/terminfo', '/usr/share/terminfo',
+               '/usr/lib/terminfo', '/usr/share/lib/terminfo')
+
+# Capability names in the order of the compiled format, see term.h.
+_BOOLNAMES = """
+bw am xsb xhp xenl eo gn hc km hs in da db mir msgr os eslok xt
+hz ul xon nxon mc5i chts nrrmc npc ndscr ccc bce hls xhpa crxm
+daisy xvpa sam cpix lpix OTbs OTns OTnc OTMT OTNL OTpt OTxr
+""".split()
+
+_NUMNAMES = """
+cols it lines lm xmc pb vt wsl nlab lh lw ma wnum colors pairs
+ncv bufsz spinv spinh maddr mjump mcs mls npins orc orl orhi
+orvi cps widcs btns bitwin bitype OTug OTdC OTdN OTdB OTdT OTkn
+""".split()
+
+_STRNAMES = """
+cbt bel cr csr tbc clear el ed hpa cmdch cup cud1 home civis
+cub1 mrcup cnorm cuf1 ll cuu1 cvvis dch1 dl1 dsl hd smacs blink
+bold smcup smdc dim smir invis prot rev smso smul ech rmacs sgr0
+rmcup rmdc rmir rmso rmul flash ff fsl is1 is2 is3 if ich1 il1
+ip kbs ktbc kclr kctab kdch1 kdl1 kcud1 krmir kel ked kf0 kf1
+kf10 kf2 kf3 kf4 kf5 kf6 kf7 kf8 kf9 khome kich1 kil1 kcub1 kll
+knp kpp kcuf1 kind kri khts kcuu1 rmkx smkx lf0 lf1 lf10 lf2 lf3
+lf4 lf5 lf6 lf7 lf8 lf9 rmm smm nel pad dch dl cud ich indn il
+cub cuf rin cuu pfkey pfloc pfx mc0 mc4 mc5 rep rs1 rs2 rs3 rf
+rc vpa sc ind ri sgr hts wind ht tsl uc hu iprog ka1 ka3 kb2 kc1
+kc3 mc5p rmp acsc pln kcbt smxon rmxon smam rmam xonc xoffc
+enacs smln rmln kbeg kcan kclo kcmd kcpy kcrt kend kent kext
+kfnd khlp kmrk kmsg kmov knxt kopn kopt kprv kprt krdo kref krfr
+krpl krst kres ksav kspd kund kBEG kCAN kCMD kCPY kCRT kDC kDL
+kslt kEND kEOL kEXT kFND kHLP kHOM kIC kLFT kMSG kMOV kNXT kOPT
+kPRV kPRT kRDO kRPL kRIT kRES kSAV kSPD kUND rfi kf11 kf12 kf13
+kf14 kf15 kf16 kf17 kf18 kf19 kf20 kf21 kf22 kf23 kf24 kf25 kf26
+kf27 kf28 kf29 kf30 kf31 kf32 kf33 kf34 kf35 kf36 kf37 kf38 kf39
+kf40 kf41 kf42 kf43 kf44 kf45 kf46 kf47 kf48 kf49 kf50 kf51 kf52
+kf53 kf54 kf55 kf56 kf57 kf58 kf59 kf60 kf61 kf62 kf63 el1 mgc
+smgl smgr fln sclk dclk rmclk cwin wingo hup dial qdial tone
+pulse hook pause wait u0 u1 u2 u3 u4 u5 u6 u7 u8 u9 op oc initc
+initp scp setf setb cpi lpi chr cvr defc swidm sdrfq sitm slm
+smicm snlq snrmq sshm ssubm ssupm sum rwidm ritm rlm rmicm rshm
+rsubm rsupm rum mhpa mcud1 mcub1 mcuf1 mvpa mcuu1 porder mcud
+mcub mcuf mcuu scs smgb smgbp smglp smgrp smgt smgtp sbim scsd
+rbim rcsd subcs supcs docr zerom csnm kmous minfo reqmp getm
+setaf setab pfxl devt csin s0ds s1ds s2ds s3ds smglr smgtb birep
+binel bicr colornm defbi endbi setcolor slines dispc smpch rmpch
+smsc rmsc pctrm scesc scesa ehhlm elhlm elohlm erhlm ethlm evhlm
+sgr1 slength OTi2 OTrs OTnl OTbc OTko OTma OTG2 OTG3 OTG1 OTG4
+OTGR OTGL OTGU OTGD OTGH OTGV OTGC meml memu box1
+""".split()
+
+
+class Terminfo(object):
+    """A parsed terminfo entry.
+
+    `names` is the list of the entry's names, the last being the
+    description. `booleans`, `numbers`, and `strings` map capability
+    names to values; absent and cancelled capabilities are omitted.
+    """
+
+    def __init__(self, names, booleans, numbers, strings):
+        self.names = names
+        self.booleans = booleans
+        self.numbers = numbers
+        self.strings = strings
+
+    def __repr__(self):
+        return '<Terminfo %s>' % (self.names[0] if self.names else '?')
+
+    def getflag(self, capname):
+        """Return true if the boolean capability is set.
+
+        Like curses.tigetflag but returns False for unknown names.
+        """
+        return self.booleans.get(capname, False)
+
+    def getnum(self, capname):
+        """Return the value of the numeric capability, or -1 if it is
+        absent.
+        """
+        return self.numbers.get(capname, _ABSENT)
+
+    def getstr(self, capname):
+        """Return the value of the string capability as bytes, or None
+        if it is absent.
+        """
+        return self.strings.get(capname)
+
+
+def _string(data, table, end, offset):
+    """Return the NUL terminated string at table + offset."""
+    start = table + offset
+    stop = data.find(b'\0', start, end)
+    if stop < 0:
+        raise ValueError('unterminated string')
+    return data[start:stop]
+
+
+def _section(data, pos, counts, numfmt):
+    """Parse a section of booleans, numbers, and strings.
+
+    Returns (booleans, numbers, offsets, table, end) where offsets
+    are the raw string offsets and table is the position of the string
+    table.
+    """
+    nbools, nnums, noffsets, tablesize = counts
+    bools = bytearray(data[pos:pos + nbools])
+    pos += nbools
+    if pos % 2:
+        pos += 1
+    numpos = pos
+    pos += nnums * struct.calcsize(numfmt)
+    offsetpos = pos
+    pos += noffsets * 2
+    if pos + tablesize > len(data):
+        raise ValueError('truncated entry')
+    nums = struct.unpack_from('<%d%s' % (nnums, numfmt), data, numpos)
+    offsets = struct.unpack_from('<%dh' % noffsets, data, offsetpos)
+    return bools, nums, offsets, pos, pos + tablesize
+
+
+def parse(data):
+    """Parse a compiled terminfo entry and return a :class:`Terminfo`.
+
+    Raises ValueError if data is not a valid entry.
+    """
+    # pylint: disable=too-many-locals
+    if len(data) < 12:
+        raise ValueError('truncated header')
+    magic, namesize, nbools, nnums, nstrs, tablesize = struct.unpack_from('<6h', data, 0)
+    if magic == MAGIC:
+        numfmt = 'h'
+    elif magic == MAGIC32:
+        numfmt = 'i'
+    else:
+        raise ValueError('bad magic number %o' % magic)
+    if min(namesize, nbools, nnums, nstrs, tablesize) < 0:
+        raise ValueError('bad header')
+
+    names = data[12:12 + namesize].rstrip(b'\0').decode('ascii', 'replace').split('|')
+    bools, nums, offsets, table, end = _section(
+        data, 12 + namesize, (nbools, nnums, nstrs, tablesize), numfmt)
+
+    booleans = dict((n, True) for n, v in zip(_BOOLNAMES, bools) if v == 1)
+    numbers = dict((n, v) for n, v in zip(_NUMNAMES, nums) if v >= 0)
+    strings = {}
+    for n, o in zip(_STRNAMES, offsets):
+        if o >= 0:
+            strings[n] = _string(data, table, end, o)
+
+    # Extended capabilities follow, aligned to an even offset
+    pos = end + end % 2
+    if len(data) - pos >= 10:
+        _extended(data, pos, numfmt, booleans, numbers, strings)
+    return Terminfo(names, booleans, numbers, strings)
+
+
+def _extended(data, pos, numfmt, booleans, numbers, strings):
+    """Parse the extended capabilities section."""
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    # The fourth field counts only the strings present, plus the names,
+    # and does not tell the number of offsets.
+    nbools, nnums, nstrs, nitems, tablesize = struct.unpack_from('<5h', data, pos)
+    if min(nbools, nnums, nstrs, nitems, tablesize) < 0:
+        raise ValueError('bad extended header')
+    noffsets = nstrs + nbools + nnums + nstrs
+    bools, nums, offsets, table, end = _section(
+        data, pos + 10, (nbools, nnums, noffsets, tablesize), numfmt)
+
+    # Values come first, then the names of all extended capabilities.
+    # Names are stored after the last value.
+    values = []
+    base = 0
+    for o in offsets[:nstrs]:
+        if o >= 0:
+            value = _string(data, table, end, o)
+            base = max(base, o + len(value) + 1)
+            values.append(value)
+        else:
+            values.append(None)
+    names = [_string(data, table + base, end, o).decode('ascii', 'replace')
+             for o in offsets[nstrs:nstrs + nbools + nnums + nstrs]]
+
+    for n, v in zip(names[:nbools], bools):
+        if v == 1:
+            booleans[n] = True
+    for n, v in zip(names[nbools:nbools + nnums], nums):
+        if v >= 0:
+            numbers[n] = v
+    for n, v in zip(names[nbools + nnums:], values):
+        if v is not None:
+            strings[n] = v
+
+
+def _dirs():
+    """Return the terminfo directories to search, in order."""
+    dirs = []
+    terminfo = os.environ.get('TERMINFO')
+    if terminfo:
+        dirs.append(terminfo)
+    home = os.environ.get('HOME')
+    if home:
+        dirs.append(os.path.join(home, '.terminfo'))
+    for d in os.environ.get('TERMINFO_DIRS', '').split(os.pathsep):
+        # An empty entry stands for the system directories
+        dirs.extend([d] if d else SYSTEM_DIRS)
+    dirs.extend(SYSTEM_DIRS)
+    return dirs
+
+
+def find(name):
+    """Return the path of the compiled entry for terminal `name`, or
+    None if there is none.
+
+    Searches TERMINFO, ~/.terminfo, TERMINFO_DIRS, and the system
+    directories. Entries may be filed under their first letter or,
+    like on macOS, its hex code.
+    """
+    if not name or '/' in name or name.startswith('.'):
+        return None
+    subdirs = (name[0], '%02x' % ord(name[0]))
+    seen = set()
+    for d in _dirs():
+        if d in seen:
+            continue
+        seen.add(d)
+        for sub in subdirs:
+            path = os.path.join(d, sub, name)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def _load(path):
+    """Parse the entry at path, using mmap."""
+    with open(path, 'rb') as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            return parse(f.read()) # Empty file, or no mmap support
+        try:
+            return parse(m)
+        finally:
+            m.close()
+
+
+# Parsed entries, (name, search path) -> Terminfo or None.
+_cache = {}
+
+
+def load(name=None):
+    """Return the :class:`Terminfo` entry of terminal `name`, or None
+    if there is none or it cannot be read.
+
+    `name` defaults to the TERM environment variable. Entries are
+    parsed once and cached.
+    """
+    if name is None:
+        name = os.environ.get('TERM', '')
+    key = (name, os.environ.get('TERMINFO'), os.environ.get('TERMINFO_DIRS'),
+           os.environ.get('HOME'))
+    try:
+        return _cache[key]
+    except KeyError:
+        pass
+    entry = None
+    path = find(name)
+    if path is not None:
+        try:
+            entry = _load(path)
+        except (ValueError, EnvironmentError):
+            entry = None
+    _cache[key] = entry
+    return entry
+
+
+def clearcache():
+    """Forget all parsed entries, e.g. after installing new ones."""
+    _cache.clear()
@@ -0,0 +1,240 @@
+"""A pty-backed stand-in terminal for tests and benchmarks.
+
+Example::
+
+    from term import getyx
+    from term.testing import FakeTerminal
+
+    with FakeTerminal(yx=(10, 5), latency=0.01):
+        assert getyx() == (10, 5)
+"""
+
+import os
+import fcntl
+import struct
+import codecs
+import select
+import random
+import threading
+import time
+
+from bisect import bisect_right
+
+from term import opentty, TIOCSWINSZ
+from term import _links, _typeahead
+from term.parser import Parser, Text, Control, Esc, CSI, OSC
+from term.width import wcwidth, _AMBIGUOUS
+
+__all__ = ["FakeTerminal"]
+
+
+def _hex4(value):
+    return b'%04x' % value
+
+
+def _rgb(color):
+    if isinstance(color, bytes):
+        return color
+    return b'rgb:' + b'/'.join(_hex4(x) for x in color)
+
+
+class FakeTerminal(object):
+    """A terminal emulator stand-in connected to a pseudo-terminal.
+
+    The terminal answers DSR 5, DSR 6, DA1, OSC 4, OSC 10, and OSC 11
+    queries written to its slave device, and tracks the cursor through
+    text, CUP, and save and restore cursor sequences. East Asian
+    Ambiguous characters take `ambiguouswidth` cells. Colors are
+    (r, g, b) tuples of 16-bit values, or reply specs like
+    b'rgb:ff/ff/ff'.
+
+    The window size of the pty is set to `size` and `pixelsize`, unless
+    `winsize` is false.
+
+    `latency` is the delay in seconds before the replies to a chunk
+    of input are sent, `jitter` the maximum random delay added to it.
+    `silent` is a collection of query names ('yx', 'fgcolor', 'bgcolor',
+    'palette', 'da1', 'status') the terminal does not answer. If `fragment` is greater than 0,
+    replies are written in pieces of that many bytes, `fragmentdelay`
+    seconds apart.
+
+    Used as a context manager, the terminal starts and
+    :attr:`opentty.device` points at it until exit.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, yx=(1, 1), size=(24, 80),
+                 fgcolor=(0, 0, 0), bgcolor=(0xffff, 0xffff, 0xffff),
+                 palette=None, da1=b'\033[?62;22c',
+                 latency=0, jitter=0, silent=(), fragment=0, fragmentdelay=0.001,
+                 ambiguouswidth=1, pixelsize=(0, 0), winsize=True):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.yx = list(yx)
+        self.size = size
+        self.fgcolor = fgcolor
+        self.bgcolor = bgcolor
+        self.palette = palette or {}
+        self.da1 = da1
+        self.latency = latency
+        self.jitter = jitter
+        self.silent = set(silent)
+        self.fragment = fragment
+        self.fragmentdelay = fragmentdelay
+        self.ambiguouswidth = ambiguouswidth
+        self.pixelsize = pixelsize
+        self.winsize = winsize
+        self.master = None
+        self.slave = None
+        self.device = None
+        self.bytesin = 0
+        self.bytesout = 0
+        self.queries = 0
+        self._thread = None
+        self._wakeup = None
+        self._saveddevice = None
+        self._savedyx = [1, 1]
+
+    def start(self):
+        """Open the pty and start answering queries."""
+        self.master, self.slave = os.openpty()
+        self.device = os.ttyname(self.slave)
+        if self.winsize:
+            self.resize(self.size, self.pixelsize)
+        # Forget state left by an earlier terminal on the same device
+        _links.pop(self.device, None)
+        _typeahead.pop(self.device, None)
+        self._wakeup = os.pipe()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop answering queries and close the pty."""
+        if self._thread is not None:
+            os.write(self._wakeup[1], b'x')
+            self._thread.join()
+            self._thread = None
+            for fd in (self.master, self.slave) + self._wakeup:
+                os.close(fd)
+            self.master = self.slave = self._wakeup = None
+
+    def __enter__(self):
+        self.start()
+        self._saveddevice = opentty.device
+        opentty.device = self.device
+        return self
+
+    def __exit__(self, *ignored):
+        opentty.device = self._saveddevice
+        self.stop()
+
+    def resize(self, size, pixelsize=(0, 0)):
+        """Change the size of the terminal and the window size of the pty."""
+        self.size = size
+        self.pixelsize = pixelsize
+        fcntl.ioctl(self.master, TIOCSWINSZ,
+                    struct.pack('HHHH', size[0], size[1], pixelsize[1], pixelsize[0]))
+
+    def type(self, data):
+        """Send data to the slave as if typed by the user."""
+        os.write(self.master, data)
+
+    def _run(self):
+        parser = Parser()
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        while True:
+            ready = select.select([self.master, self._wakeup[0]], [], [])[0]
+            if self._wakeup[0] in ready:
+                break
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                break
+            self.bytesin += len(data)
+            replies = []
+            for event in parser.feed(data):
+                self._handle(event, replies, decoder)
+            if replies:
+                self._send(b''.join(replies))
+
+    def _handle(self, event, replies, decoder):
+        if isinstance(event, Text):
+            self._advance(self._width(decoder.decode(bytes(event.data))))
+        elif isinstance(event, Control):
+            if event.code == b'\r':
+                self.yx[1] = 1
+            elif event.code == b'\n':
+                self.yx[0] = min(self.yx[0] + 1, self.size[0])
+        elif isinstance(event, CSI):
+            self._handlecsi(event, replies)
+        elif isinstance(event, OSC):
+            self._handleosc(bytes(event.data), replies)
+        elif isinstance(event, Esc):
+            if event.final == b'7':
+                self._savedyx = list(self.yx)
+            elif event.final == b'8':
+                self.yx = list(self._savedyx)
+
+    def _width(self, text):
+        n = 0
+        for c in text:
+            if bisect_right(_AMBIGUOUS, ord(c)) & 1:
+                n += self.ambiguouswidth
+            else:
+                n += max(wcwidth(c), 0)
+        return n
+
+    def _advance(self, n):
+        line, col = self.yx
+        col += n
+        while col > self.size[1]:
+            col -= self.size[1]
+            line = min(line + 1, self.size[0])
+        self.yx = [line, col]
+
+    def _handlecsi(self, event, replies):
+        params, final = event.params, event.final
+        if final == b'n' and params == b'6':
+            self._reply(replies, 'yx', b'\033[%d;%dR' % tuple(self.yx))
+        elif final == b'n' and params == b'5':
+            self._reply(replies, 'status', b'\033[0n')
+        elif final == b'c' and params in (b'', b'0'):
+            self._reply(replies, 'da1', self.da1)
+        elif final in (b'H', b'f') and not params.startswith(b'?'):
+            args = [int(x or 1) for x in params.split(b';')] + [1, 1]
+            self.yx = [min(max(args[0], 1), self.size[0]),
+                       min(max(args[1], 1), self.size[1])]
+
+    def _handleosc(self, data, replies):
+        if data == b'10;?':
+            self._reply(replies, 'fgcolor', b'\033]10;' + _rgb(self.fgcolor) + b'\007')
+        elif data == b'11;?':
+            self._reply(replies, 'bgcolor', b'\033]11;' + _rgb(self.bgcolor) + b'\007')
+        elif data.startswith(b'4;'):
+            args = data.split(b';')[1:]
+            for index, spec in zip(args[::2], args[1::2]):
+                color = self.palette.get(int(index))
+                if spec == b'?' and color is not None:
+                    self._reply(replies, 'palette',
+                                b'\033]4;' + index + b';' + _rgb(color) + b'\007')
+
+    def _reply(self, replies, name, reply):
+        self.queries += 1
+        if name not in self.silent:
+            replies.append(reply)
+
+    def _send(self, data):
+        delay = self.latency
+        if self.jitter:
+            delay += random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self.fragment > 0:
+            for i in range(0, len(data), self.fragment):
+                if i:
+                    time.sleep(self.fragmentdelay)
+                os.write(self.master, data[i:i+self.fragment])
+        else:
+            os.write(self.master, data)
+        self.bytesout += len(data)
@@ -0,0 +1,23 @@
+"""Coroutine helpers for test_aio.
+
+Imported on Python 3.7+ only, async def is a syntax error before.
+"""
+
+import asyncio
+
+
+def run(coro, fd, callback):
+    """Run coro, calling callback whenever fd becomes readable."""
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.add_reader(fd, callback)
+        try:
+            return await coro
+        finally:
+            loop.remove_reader(fd)
+    return asyncio.run(main())
+
+
+async def gather(*coros):
+    """Run coros concurrently and return their results."""
+    return await asyncio.gather(*coros)
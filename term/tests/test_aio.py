@@ -0,0 +1,96 @@
+import sys
+import os
+import unittest
+
+from termios import tcgetattr
+
+from term import opentty
+
+if sys.version_info >= (3, 7):
+    import asyncio
+    from term import aio
+    from term.tests.asyncutils import run, gather
+else:
+    asyncio = aio = run = gather = None
+
+
+REPLIES = {
+    b'\033[6n': b'\033[24;1R',
+    b'\033]10;?\007': b'\033]10;rgb:0000/0000/0000\007',
+    b'\033]11;?\007': b'\033]11;rgb:ffff/ffff/ffff\007',
+    b'\033[c': b'\033[?62;22c',
+}
+
+
+@unittest.skipIf(aio is None, 'requires Python 3.7')
+class AioTests(unittest.TestCase):
+
+    def setUp(self):
+        self.master, self.slave = os.openpty()
+        self.saveddevice = opentty.device
+        opentty.device = os.ttyname(self.slave)
+        self.replies = dict(REPLIES)
+
+    def tearDown(self):
+        opentty.device = self.saveddevice
+        os.close(self.master)
+        os.close(self.slave)
+
+    def respond(self):
+        data = os.read(self.master, 1024)
+        for request, reply in self.replies.items():
+            if request in data:
+                os.write(self.master, reply)
+
+    def run_(self, coro):
+        return run(coro, self.master, self.respond)
+
+    def test_query(self):
+        self.assertEqual(self.run_(aio.query('yx', 'bgcolor')),
+                         ((24, 1), (65535, 65535, 65535)))
+
+    def test_getyx(self):
+        self.assertEqual(self.run_(aio.getyx()), (24, 1))
+
+    def test_getfgcolor(self):
+        self.assertEqual(self.run_(aio.getfgcolor()), (0, 0, 0))
+
+    def test_getpalette(self):
+        # Replies arrive out of order, the reply for color 2 never
+        self.replies = {
+            b'\033]4;1;?\007': b'\033]4;1;#cd0000\007',
+            b'\033]4;0;?\007': b'\033]4;0;rgb:0/0/0\007',
+            b'\033[c': b'\033[?62;22c',
+        }
+        self.assertEqual(list(self.run_(aio.getpalette(3))),
+                         [0, 0, 0, 52685, 0, 0, -1, -1, -1])
+
+    def test_getpalette_too_many(self):
+        self.assertRaises(ValueError, self.run_, aio.getpalette(257))
+
+    def test_islightmode(self):
+        self.assertEqual(self.run_(aio.islightmode()), True)
+        self.assertEqual(self.run_(aio.isdarkmode()), False)
+
+    def test_concurrent(self):
+        mode = tcgetattr(self.slave)
+        self.assertEqual(self.run_(gather(aio.getyx(), aio.islightmode(), aio.getfgcolor())),
+                         [(24, 1), True, (0, 0, 0)])
+        self.assertEqual(tcgetattr(self.slave), mode)
+
+    def test_unsupported(self):
+        del self.replies[b'\033]11;?\007']
+        self.assertEqual(self.run_(aio.getbgcolor()), (-1, -1, -1))
+
+    def test_timeout(self):
+        self.replies = {}
+        self.assertEqual(self.run_(aio.getyx()), (0, 0))
+
+    def test_wait_for(self):
+        self.replies = {}
+        self.assertRaises(asyncio.TimeoutError, self.run_,
+                          asyncio.wait_for(aio.getyx(), 0.01))
+
+    def test_bad_device(self):
+        opentty.device = '/dev/foobar'
+        self.assertEqual(self.run_(aio.getyx()), (0, 0))
@@ -0,0 +1,125 @@
+import time
+import unittest
+
+from term import luminance, Terminal
+from term.colors import Quantizer, XTERM_PALETTE
+from term.colors import pack, unpack, luminances, relativeluminances, contrastratios
+from term.colors import numpy
+from term.testing import FakeTerminal
+
+COLORS = [0xff0000, 0x123456, 0x808080, 0xffffff, 0x5f87af, 0x000000, 0xcd0001]
+
+
+class ColorTests(unittest.TestCase):
+
+    def test_pack(self):
+        self.assertEqual(list(pack([(255, 0, 0), (1, 2, 3)])), [0xff0000, 0x010203])
+        self.assertEqual(unpack([0xff0000, 0x010203]), [(255, 0, 0), (1, 2, 3)])
+
+    def test_xterm_palette(self):
+        self.assertEqual(len(XTERM_PALETTE), 256)
+        self.assertEqual(XTERM_PALETTE[16], 0x000000)
+        self.assertEqual(XTERM_PALETTE[67], 0x5f87af)
+        self.assertEqual(XTERM_PALETTE[231], 0xffffff)
+        self.assertEqual(XTERM_PALETTE[244], 0x808080)
+
+    def test_quantize_256(self):
+        self.assertEqual(list(Quantizer().quantize(COLORS)), [9, 23, 244, 15, 67, 0, 1])
+
+    def test_quantize_16(self):
+        self.assertEqual(list(Quantizer(16).quantize(COLORS)), [9, 0, 8, 15, 8, 0, 1])
+
+    def test_quantize_8(self):
+        self.assertEqual(list(Quantizer(8).quantize(COLORS)), [1, 0, 3, 7, 6, 0, 1])
+
+    def test_numcolors(self):
+        self.assertEqual(Quantizer(1 << 24).numcolors, 256)
+        self.assertEqual(Quantizer(88).numcolors, 16)
+        self.assertEqual(Quantizer(0).numcolors, 8)
+
+    def test_brute_force(self):
+        q = Quantizer()
+        rgb = unpack(q.palette)
+        for color in range(0, 1 << 24, 0x10307):
+            r, g, b = unpack([color])[0]
+            dist = [(x - r) ** 2 + (y - g) ** 2 + (z - b) ** 2 for x, y, z in rgb]
+            self.assertEqual(dist[q.quantize([color])[0]], min(dist))
+
+    def test_custom_palette(self):
+        q = Quantizer(16, [0x000000, 0x123456])
+        self.assertEqual(q.quantize([0x123457])[0], 1)
+        self.assertEqual(q.palette[2], XTERM_PALETTE[2])
+
+    def test_colors(self):
+        q = Quantizer()
+        self.assertEqual(list(q.colors(q.quantize([0x5f87ae]))), [0x5f87af])
+
+    def test_luminances(self):
+        for color, lum in zip(COLORS, luminances(COLORS)):
+            self.assertAlmostEqual(lum, luminance(unpack([color])[0]))
+
+    def test_relativeluminances(self):
+        self.assertEqual(list(relativeluminances([0x000000, 0xffffff])), [0.0, 1.0])
+        self.assertAlmostEqual(relativeluminances([0x808080])[0], 0.2158605)
+
+    def test_contrastratios(self):
+        self.assertEqual(list(contrastratios([0xffffff, 0x000000], 0x000000)), [21.0, 1.0])
+        self.assertEqual(list(contrastratios([0x000000], 0xffffff)), [21.0])
+        self.assertAlmostEqual(contrastratios([0x767676], 0xffffff)[0], 4.54, places=2)
+
+    def test_fromterminal(self):
+        palette = {1: (0xaaaa, 0, 0)}
+        with FakeTerminal(palette=palette, bgcolor=(0xffff, 0xffff, 0xffff)):
+            q = Quantizer.fromterminal(16)
+        self.assertEqual(q.numcolors, 16)
+        self.assertEqual(q.palette[1], 0xaa0000)
+        self.assertEqual(q.palette[2], XTERM_PALETTE[2])
+        self.assertEqual(q.background, 0xffffff)
+        self.assertEqual(q.quantize([0xa00000])[0], 1)
+        self.assertEqual(list(q.contrast([0x000000])), [21.0])
+
+    def test_fromterminal_8bit_background(self):
+        with FakeTerminal(bgcolor=b'rgb:ff/ff/ff'):
+            q = Quantizer.fromterminal(8)
+        self.assertEqual(q.background, 0xffffff)
+        with FakeTerminal(bgcolor=b'rgb:f/80/0000'):
+            q = Quantizer.fromterminal(8)
+        self.assertEqual(q.background, 0xff8000)
+
+    def test_fromterminal_one_round_trip(self):
+        with FakeTerminal(bgcolor=(0, 0, 0), latency=0.1):
+            start = time.time()
+            q = Quantizer.fromterminal(256)
+            self.assertTrue(time.time() - start < 0.2)
+        self.assertEqual(q.background, 0x000000)
+        self.assertEqual(q.numcolors, 256)
+
+    def test_fromterminal_session(self):
+        with FakeTerminal(palette={0: (0x1010, 0x1010, 0x1010)}):
+            with Terminal() as t:
+                q = Quantizer.fromterminal(8, t)
+        self.assertEqual(q.palette[0], 0x101010)
+
+
+@unittest.skipIf(numpy is None, 'requires NumPy')
+class NumPyTests(unittest.TestCase):
+
+    def test_quantize(self):
+        colors = numpy.array(COLORS * 3, dtype='u4').reshape(3, -1)
+        for numcolors in (8, 16, 256):
+            q = Quantizer(numcolors)
+            result = q.quantize(colors)
+            self.assertEqual(result.shape, colors.shape)
+            self.assertEqual(result[1].tolist(), list(q.quantize(COLORS)))
+
+    def test_quantize_many(self):
+        colors = numpy.arange(0, 1 << 24, 97, dtype='i4')
+        q = Quantizer()
+        self.assertEqual(q.quantize(colors)[::1000].tolist(),
+                         list(q.quantize(colors[::1000].tolist())))
+
+    def test_luminances(self):
+        colors = numpy.array(COLORS)
+        self.assertTrue(numpy.allclose(luminances(colors), list(luminances(COLORS))))
+        self.assertTrue(numpy.allclose(contrastratios(colors, 0xffffff),
+                                       list(contrastratios(COLORS, 0xffffff))))
@@ -0,0 +1,145 @@
+import os
+import time
+import unittest
+
+from term import getyx
+from term.cursor import Cursor
+from term.testing import FakeTerminal
+
+
+class CursorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.queries = 0
+        self.cursor = Cursor((24, 80), query=self.query)
+        self.cursor.moveto(1, 1)
+
+    def query(self):
+        self.queries += 1
+        return (5, 7)
+
+    def feed(self, data):
+        self.cursor.feed(data)
+        return self.cursor.getyx()
+
+    def test_text(self):
+        self.assertEqual(self.feed(b'hello'), (1, 6))
+        self.assertEqual(self.feed(u'world'), (1, 11))
+        self.assertEqual(self.queries, 0)
+
+    def test_controls(self):
+        self.assertEqual(self.feed(b'abc\r'), (1, 1))
+        self.assertEqual(self.feed(b'abc\n'), (2, 1))
+        self.assertEqual(self.feed(b'abc\b\b'), (2, 2))
+        self.assertEqual(self.feed(b'\t'), (2, 9))
+        self.assertEqual(self.feed(b'\t'), (2, 17))
+        self.assertEqual(self.feed(b'\007'), (2, 17))
+        self.assertEqual(self.feed(b'\x0b'), (3, 17))
+        self.assertEqual(self.queries, 0)
+
+    def test_raw_newline(self):
+        self.cursor.onlcr = False
+        self.assertEqual(self.feed(b'abc\n'), (2, 4))
+        self.assertEqual(self.feed(b'\r\n'), (3, 1))
+
+    def test_wrap(self):
+        self.assertEqual(self.feed(b'x' * 80), (1, 80))
+        self.assertEqual(self.feed(b'y'), (2, 2))
+        self.assertEqual(self.feed(b'z' * 200), (4, 42))
+
+    def test_deferred_wrap(self):
+        self.assertEqual(self.feed(b'x' * 80 + b'\r'), (1, 1))
+        self.assertEqual(self.feed(b'x' * 80 + b'\r\n'), (2, 1))
+
+    def test_scroll(self):
+        self.cursor.moveto(24, 1)
+        self.assertEqual(self.feed(b'a\nb\n'), (24, 1))
+        self.assertEqual(self.feed(b'x' * 200), (24, 41))
+
+    def test_csi(self):
+        self.assertEqual(self.feed(b'\033[10;20H'), (10, 20))
+        self.assertEqual(self.feed(b'\033[3A'), (7, 20))
+        self.assertEqual(self.feed(b'\033[B'), (8, 20))
+        self.assertEqual(self.feed(b'\033[5C'), (8, 25))
+        self.assertEqual(self.feed(b'\033[30D'), (8, 1))
+        self.assertEqual(self.feed(b'\033[40G'), (8, 40))
+        self.assertEqual(self.feed(b'\033[2E'), (10, 1))
+        self.assertEqual(self.feed(b'\033[F'), (9, 1))
+        self.assertEqual(self.feed(b'\033[12d'), (12, 1))
+        self.assertEqual(self.feed(b'\033[H'), (1, 1))
+        self.assertEqual(self.feed(b'\033[99;99f'), (24, 80))
+        self.assertEqual(self.queries, 0)
+
+    def test_save_restore(self):
+        self.assertEqual(self.feed(b'\033[5;5H\0337\033[H\0338'), (5, 5))
+        self.assertEqual(self.feed(b'\033[s\033[9;9H\033[u'), (5, 5))
+
+    def test_still(self):
+        self.assertEqual(self.feed(b'ab\033[1;31m\033[K\033[2J\033[?25l\033]0;title\007'), (1, 3))
+        self.assertEqual(self.feed(b'\033(B\033[?2004h'), (1, 3))
+        self.assertEqual(self.queries, 0)
+
+    def test_split_sequence(self):
+        self.cursor.feed(b'\033[10;')
+        self.assertEqual(self.feed(b'20H'), (10, 20))
+
+    def test_uncertain(self):
+        self.assertEqual(self.feed(u'\u4e2d'), (5, 7))
+        self.assertEqual(self.queries, 1)
+        self.assertEqual(self.feed(b'\033[1z'), (5, 7))
+        self.assertEqual(self.queries, 2)
+        self.assertEqual(self.feed(b'ab'), (5, 9))
+        self.assertEqual(self.queries, 2)
+
+    def test_unmodeled_modes(self):
+        self.feed(b'\033[?7l')
+        self.assertEqual(self.feed(b'\033[H'), (5, 7))
+        self.assertEqual(self.feed(b'x'), (5, 7))
+        self.assertEqual(self.queries, 3)
+        self.feed(b'\033[?7h\033[H')
+        self.assertEqual(self.feed(b'x'), (1, 2))
+        self.assertEqual(self.queries, 3)
+        self.assertEqual(self.feed(b'\033[5;10r'), (5, 7))
+        self.assertEqual(self.feed(b'\033[r'), (1, 1))
+
+    def test_interval(self):
+        self.cursor.interval = 0.05
+        self.assertEqual(self.feed(b'ab'), (1, 3))
+        self.assertEqual(self.queries, 0)
+        time.sleep(0.06)
+        self.assertEqual(self.cursor.getyx(), (5, 7))
+        self.assertEqual(self.queries, 1)
+        self.assertEqual(self.cursor.getyx(), (5, 7))
+        self.assertEqual(self.queries, 1)
+
+    def test_resize(self):
+        self.cursor.resize((10, 40))
+        self.assertEqual(self.cursor.getyx(), (5, 7))
+        self.assertEqual(self.feed(b'x' * 40), (6, 7))
+
+    def test_no_reply(self):
+        cursor = Cursor((24, 80), query=lambda: (0, 0))
+        self.assertEqual(cursor.sync(), False)
+        self.assertEqual(cursor.uncertain, True)
+
+    def test_terminal(self):
+        with FakeTerminal(yx=(3, 4)):
+            cursor = Cursor((24, 80))
+            self.assertEqual(cursor.getyx(), (3, 4))
+            self.assertEqual(cursor.syncs, 1)
+            cursor.feed(b'abc')
+            self.assertEqual(cursor.getyx(), (3, 7))
+            self.assertEqual(cursor.syncs, 1)
+
+    def test_terminal_newline(self):
+        with FakeTerminal(yx=(5, 1)) as ft:
+            cursor = Cursor((24, 80))
+            cursor.getyx()
+            fd = os.open(ft.device, os.O_WRONLY | os.O_NOCTTY)
+            try:
+                os.write(fd, b'hello\nworld')
+            finally:
+                os.close(fd)
+            cursor.feed(b'hello\nworld')
+            self.assertEqual(cursor.getyx(), (6, 6))
+            self.assertEqual(getyx(), (6, 6))
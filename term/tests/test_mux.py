@@ -0,0 +1,68 @@
+import os
+import time
+import unittest
+
+from term.mux import Multiplexer, query
+from term.testing import FakeTerminal
+
+
+class MuxTests(unittest.TestCase):
+
+    def setUp(self):
+        self.terminals = []
+
+    def tearDown(self):
+        for ft in self.terminals:
+            ft.stop()
+
+    def start(self, **kw):
+        ft = FakeTerminal(**kw)
+        ft.start()
+        self.terminals.append(ft)
+        return ft
+
+    def test_query(self):
+        fts = [self.start(yx=(i, 1)) for i in range(1, 21)]
+        results = query([ft.slave for ft in fts], 'yx', 'bgcolor')
+        self.assertEqual(len(results), 20)
+        for i, ft in enumerate(fts):
+            self.assertEqual(results[ft.slave], ((i + 1, 1), (65535, 65535, 65535)))
+
+    def test_silent(self):
+        ft1 = self.start(yx=(10, 5))
+        ft2 = self.start(silent=['yx', 'da1'])
+        start = time.time()
+        results = Multiplexer(timeout=0.05).query([ft1.slave, ft2.slave], 'yx')
+        self.assertTrue(time.time() - start < 0.2)
+        self.assertEqual(results, {ft1.slave: ((10, 5),), ft2.slave: ((0, 0),)})
+
+    def test_latency(self):
+        fts = [self.start(yx=(10, 5), latency=0.05) for i in range(10)]
+        start = time.time()
+        results = query([ft.slave for ft in fts], 'yx')
+        # Replies are collected concurrently
+        self.assertTrue(time.time() - start < 0.2)
+        self.assertEqual(set(results.values()), set([((10, 5),)]))
+
+    def test_restores_mode(self):
+        ft = self.start()
+        mode = os.get_blocking(ft.slave) if hasattr(os, 'get_blocking') else None
+        query([ft.slave], 'yx')
+        if mode is not None:
+            self.assertEqual(os.get_blocking(ft.slave), mode)
+
+    def test_typeahead(self):
+        ft = self.start()
+        ft.type(b'ab')
+        mux = Multiplexer()
+        mux.query([ft.slave], 'yx')
+        self.assertEqual(mux.readtypeahead(ft.slave), b'ab')
+        self.assertEqual(mux.readtypeahead(ft.slave), b'')
+
+    def test_not_a_tty(self):
+        r, w = os.pipe()
+        try:
+            self.assertEqual(Multiplexer(timeout=0.01).query([r], 'yx'), {r: ((0, 0),)})
+        finally:
+            os.close(r)
+            os.close(w)
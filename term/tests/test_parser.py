@@ -0,0 +1,125 @@
+import sys
+import unittest
+
+from term.parser import Parser
+from term.parser import Text, Control, Esc, CSI, OSC, DCS, SS3
+
+
+# The type of payloads contained in a single chunk
+if sys.version_info[0] >= 3:
+    VIEW = memoryview
+else:
+    VIEW = bytearray
+
+
+def tobytes(events):
+    # Replace memoryviews by bytes for comparison
+    result = []
+    for event in events:
+        result.append(type(event)(*[bytes(x) if isinstance(x, memoryview) else x
+                                    for x in event]))
+    return result
+
+
+class ParserTests(unittest.TestCase):
+    # pylint: disable=too-many-public-methods
+
+    def setUp(self):
+        self.parser = Parser()
+
+    def feed(self, *chunks):
+        events = []
+        for chunk in chunks:
+            events.extend(self.parser.feed(chunk))
+        return tobytes(events)
+
+    def test_text(self):
+        self.assertEqual(self.feed(b'hello'), [Text(b'hello')])
+
+    def test_text_is_memoryview(self):
+        events = self.parser.feed(b'hello')
+        self.assertTrue(isinstance(events[0].data, VIEW))
+
+    def test_controls(self):
+        self.assertEqual(self.feed(b'a\r\nb'),
+                         [Text(b'a'), Control(b'\r'), Control(b'\n'), Text(b'b')])
+
+    def test_del_is_ignored(self):
+        self.assertEqual(self.feed(b'a\x7fb'), [Text(b'a'), Text(b'b')])
+
+    def test_csi(self):
+        self.assertEqual(self.feed(b'\033[24;1R'), [CSI(b'24;1', b'', b'R')])
+
+    def test_csi_private(self):
+        self.assertEqual(self.feed(b'\033[?62;22c'), [CSI(b'?62;22', b'', b'c')])
+
+    def test_csi_intermediates(self):
+        self.assertEqual(self.feed(b'\033[2 q'), [CSI(b'2', b' ', b'q')])
+
+    def test_csi_invalid_is_ignored(self):
+        self.assertEqual(self.feed(b'\033[1 2Hx'), [Text(b'x')])
+
+    def test_csi_split(self):
+        self.assertEqual(self.feed(b'\033', b'[2', b'4;', b'1R'),
+                         [CSI(b'24;1', b'', b'R')])
+
+    def test_csi_executes_controls(self):
+        self.assertEqual(self.feed(b'\033[2\r4;\n1R'),
+                         [Control(b'\r'), Control(b'\n'), CSI(b'24;1', b'', b'R')])
+
+    def test_csi_split_controls(self):
+        self.assertEqual(self.feed(b'\033[2', b'\b4', b';1R'),
+                         [Control(b'\b'), CSI(b'24;1', b'', b'R')])
+
+    def test_csi_ignores_del(self):
+        self.assertEqual(self.feed(b'\033[24\x7f;1R'), [CSI(b'24;1', b'', b'R')])
+
+    def test_dcs_ignores_controls(self):
+        self.assertEqual(self.feed(b'\033P1\r$r0m\033\\'),
+                         [DCS(b'1', b'$', b'r', b'0m')])
+
+    def test_csi_cancelled(self):
+        self.assertEqual(self.feed(b'\033[24\030x'), [Text(b'x')])
+
+    def test_osc_bel(self):
+        self.assertEqual(self.feed(b'\033]11;rgb:ffff/ffff/ffff\007'),
+                         [OSC(b'11;rgb:ffff/ffff/ffff')])
+
+    def test_osc_st(self):
+        self.assertEqual(self.feed(b'\033]11;rgb:ffff/ffff/ffff\033\\x'),
+                         [OSC(b'11;rgb:ffff/ffff/ffff'), Text(b'x')])
+
+    def test_osc_split(self):
+        self.assertEqual(self.feed(b'\033]10;rg', b'b:0/0/0\033', b'\\'),
+                         [OSC(b'10;rgb:0/0/0')])
+
+    def test_osc_is_memoryview(self):
+        events = self.parser.feed(b'\033]11;?\007')
+        self.assertTrue(isinstance(events[0].data, VIEW))
+
+    def test_dcs(self):
+        self.assertEqual(self.feed(b'\033P1$r0m\033\\'),
+                         [DCS(b'1', b'$', b'r', b'0m')])
+
+    def test_ss3(self):
+        self.assertEqual(self.feed(b'\033OA\033O', b'P'), [SS3(b'A'), SS3(b'P')])
+
+    def test_esc(self):
+        self.assertEqual(self.feed(b'\0337\033(B'), [Esc(b'', b'7'), Esc(b'(', b'B')])
+
+    def test_apc_is_ignored(self):
+        self.assertEqual(self.feed(b'\033_Gi=1;OK\033\\x'), [Text(b'x')])
+
+    def test_mixed(self):
+        self.assertEqual(self.feed(b'ab\033[24;1Rcd\033]11;?\007\033[?62c'),
+                         [Text(b'ab'), CSI(b'24;1', b'', b'R'), Text(b'cd'),
+                          OSC(b'11;?'), CSI(b'?62', b'', b'c')])
+
+    def test_feed_memoryview(self):
+        data = memoryview(b'xx\033[Axx')[2:5]
+        self.assertEqual(tobytes(self.parser.feed(data)), [CSI(b'', b'', b'A')])
+
+    def test_reset(self):
+        self.feed(b'\033]11;rgb')
+        self.parser.reset()
+        self.assertEqual(self.feed(b'x'), [Text(b'x')])
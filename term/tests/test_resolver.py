@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from term.resolver import resolve, ENV, TERMINFO, TTY
+from term.terminfo import clearcache
+from term.testing import FakeTerminal
+
+from term.tests.test_terminfo import compile_entry
+
+VARS = ('TERM', 'COLORTERM', 'TERM_PROGRAM', 'VTE_VERSION', 'COLORFGBG',
+        'KITTY_WINDOW_ID', 'WT_SESSION', 'TERMINFO', 'TERMINFO_DIRS')
+
+
+class ResolverTests(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = dict((k, os.environ.pop(k, None)) for k in VARS)
+        self.dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.dir, 'f'))
+        os.environ['TERMINFO'] = self.dir
+        os.environ['TERMINFO_DIRS'] = self.dir
+        os.environ['TERM'] = 'foo-term'
+        clearcache()
+
+    def tearDown(self):
+        for k, v in self.saved.items():
+            os.environ.pop(k, None)
+            if v is not None:
+                os.environ[k] = v
+        shutil.rmtree(self.dir)
+        clearcache()
+
+    def install(self, **kw):
+        with open(os.path.join(self.dir, 'f', 'foo-term'), 'wb') as f:
+            f.write(compile_entry(['foo-term'], **kw))
+
+    def test_colorterm(self):
+        os.environ['COLORTERM'] = 'truecolor'
+        self.assertEqual(resolve('numcolors'), (1 << 24, ENV))
+        self.assertEqual(resolve('directcolor'), (True, ENV))
+
+    def test_term_program(self):
+        os.environ['TERM_PROGRAM'] = 'Apple_Terminal'
+        self.assertEqual(resolve('numcolors'), (256, ENV))
+        self.assertEqual(resolve('directcolor'), (False, ENV))
+
+    def test_vte_version(self):
+        os.environ['VTE_VERSION'] = '6003'
+        self.assertEqual(resolve('numcolors'), (1 << 24, ENV))
+        os.environ['VTE_VERSION'] = '3405'
+        self.assertEqual(resolve('numcolors'), (0, None))
+
+    def test_dumb(self):
+        os.environ['TERM'] = 'dumb'
+        os.environ['COLORTERM'] = 'truecolor'
+        self.assertEqual(resolve('numcolors'), (0, ENV))
+
+    def test_terminfo(self):
+        self.install(nums={'colors': 256})
+        self.assertEqual(resolve('numcolors'), (256, TERMINFO))
+        self.assertEqual(resolve('directcolor'), (False, TERMINFO))
+
+    def test_terminfo_rgb(self):
+        self.install(bools=['RGB'], nums={'colors': 256}, ext=(['RGB'], [], []))
+        self.assertEqual(resolve('numcolors'), (1 << 24, TERMINFO))
+        self.assertEqual(resolve('directcolor'), (True, TERMINFO))
+
+    def test_env_wins(self):
+        self.install(nums={'colors': 8})
+        os.environ['COLORTERM'] = '24bit'
+        self.assertEqual(resolve('numcolors'), (1 << 24, ENV))
+        self.assertEqual(resolve('numcolors', (TERMINFO,)), (8, TERMINFO))
+
+    def test_colorfgbg(self):
+        os.environ['COLORFGBG'] = '0;15'
+        self.assertEqual(resolve('lightmode'), (True, ENV))
+        os.environ['COLORFGBG'] = '15;default;0'
+        self.assertEqual(resolve('lightmode'), (False, ENV))
+
+    def test_tty(self):
+        with FakeTerminal(bgcolor=(0, 0, 0), fgcolor=(0xffff, 0xffff, 0xffff)):
+            self.assertEqual(resolve('lightmode'), (False, TTY))
+            self.assertEqual(resolve('lightmode', (ENV, TERMINFO)), (None, None))
+
+    def test_unknown(self):
+        self.assertRaises(KeyError, resolve, 'foo')
@@ -1,24 +1,60 @@
 import sys
 import os
+import io
 import unittest
+import time
+import signal
 import termios
+import shutil
+import tempfile
 
 # pylint: disable=wildcard-import
 # pylint: disable=unused-wildcard-import
+# pylint: disable=too-many-lines
 from termios import *
 from term import *
 
+import term
+
 from term import MODE
 from term import _opentty
+from term import _modestack
 from term import _readyx
 from term import _readcolor
-#from term import getyx
+from term import _query
+from term import _textyx
+from term import iterrecords
+from term import readtypeahead
+from term import getyx
+from term import getyx_text_mode
 from term import getbgcolor
 from term import getfgcolor
 from term import luminance
 from term import islightmode
 from term import isdarkmode
 from term import isxterm
+from term import Terminal
+from term import CapabilityCache
+from term import SharedCapabilityCache
+from term import enablecache
+from term import disablecache
+from term import invalidatecache
+from term import query
+from term import TIMEOUT
+from term import Metrics
+from term import enablemetrics
+from term import disablemetrics
+from term import AdaptiveTimeout
+from term import enableadaptivetimeout
+from term import disableadaptivetimeout
+from term import gettimeout
+from term import getsize
+from term import getpixelsize
+from term import invalidatesize
+from term import getpalette
+from term import _scanreplies
+from term import _pending
+from term.testing import FakeTerminal
 
 if sys.version_info[0] >= 3:
     from io import BytesIO
@@ -36,6 +72,40 @@ def int_(x):
     return x
 
 
+class ChunkedIO(BytesIO):
+    # Return at most 2 bytes per read, like a slow tty
+    def read1(self, size=-1):
+        return self.read(2 if size < 0 else min(size, 2))
+
+
+class CountingCache(SharedCapabilityCache):
+    # Count writes of the cache file
+    saves = 0
+
+    def _savefile(self):
+        self.saves += 1
+        SharedCapabilityCache._savefile(self)
+
+
+class FakeTTY(ChunkedIO):
+    # Canned replies, written queries are recorded
+    def __init__(self, replies):
+        ChunkedIO.__init__(self, replies)
+        self.written = b''
+    def write(self, b):
+        self.written += b
+        return len(b)
+
+
+def textmode():
+    # Python 3 supports text I/O on seekable ttys only
+    try:
+        with opentty(mode='r+') as tty:
+            return tty is not None
+    except ValueError:
+        return False
+
+
 class setterm(object):
     def __init__(self, val):
         self._val = val
@@ -67,6 +137,695 @@ class IntegerTests(unittest.TestCase):
         self.assertRaises(TypeError, int_, b'32767')
 
 
+class termioscounter(object):
+    # Count tcgetattr and tcsetattr calls made by term
+    def __init__(self):
+        self.get = self.set = 0
+        self._saved = None
+    def __enter__(self):
+        self._saved = term.tcgetattr, term.tcsetattr
+        def get(fd):
+            self.get += 1
+            return self._saved[0](fd)
+        def set(fd, when, mode):
+            self.set += 1
+            return self._saved[1](fd, when, mode)
+        term.tcgetattr, term.tcsetattr = get, set
+        return self
+    def __exit__(self, *ignored):
+        term.tcgetattr, term.tcsetattr = self._saved
+
+
+class ModeStackTests(unittest.TestCase):
+
+    def setUp(self):
+        self.master, self.slave = os.openpty()
+
+    def tearDown(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+    def test_cbreakmode(self):
+        with termioscounter() as c:
+            with cbreakmode(self.slave):
+                pass
+        self.assertEqual((c.get, c.set), (1, 2))
+
+    def test_nested_same_mode(self):
+        with termioscounter() as c:
+            with cbreakmode(self.slave, min=0, time=1):
+                with cbreakmode(self.slave, min=0, time=1):
+                    pass
+        self.assertEqual((c.get, c.set), (1, 2))
+
+    def test_nested_cbreak_in_raw(self):
+        with rawmode(self.slave):
+            with termioscounter() as c:
+                with cbreakmode(self.slave, min=0, time=1):
+                    mode = tcgetattr(self.slave)
+                    self.assertEqual(int_(mode[CC][VMIN]), 0)
+                    self.assertEqual(mode[LFLAG] & ISIG, 0)
+                mode = tcgetattr(self.slave)
+                self.assertEqual(int_(mode[CC][VMIN]), 1)
+        self.assertEqual((c.get, c.set), (0, 2))
+
+    def test_nested_restores(self):
+        saved = tcgetattr(self.slave)
+        with rawmode(self.slave):
+            with cbreakmode(self.slave, min=0, time=1):
+                pass
+        self.assertEqual(tcgetattr(self.slave), saved)
+
+    def test_setraw_inside(self):
+        with rawmode(self.slave, min=0, time=1):
+            with termioscounter() as c:
+                setraw(self.slave, min=0, time=1)
+                setraw(self.slave, min=1, time=0)
+            self.assertEqual((c.get, c.set), (0, 1))
+            self.assertEqual(int_(tcgetattr(self.slave)[CC][VMIN]), 1)
+
+    def test_reenter(self):
+        mode = cbreakmode(self.slave)
+        with mode:
+            pass
+        with mode:
+            pass
+        self.assertEqual(_modestack, {})
+
+    def test_file_object(self):
+        with open(os.ttyname(self.slave), 'rb') as f:
+            with rawmode(f):
+                self.assertEqual(tcgetattr(f)[LFLAG] & ICANON, 0)
+
+
+class RoundTripTests(unittest.TestCase):
+
+    def test_getyx(self):
+        with FakeTerminal(yx=(10, 5)):
+            self.assertEqual(getyx(), (10, 5))
+
+    def test_colors(self):
+        with FakeTerminal(fgcolor=(1, 2, 3), bgcolor=(4, 5, 6)):
+            self.assertEqual(getfgcolor(), (1, 2, 3))
+            self.assertEqual(getbgcolor(), (4, 5, 6))
+
+    def test_islightmode(self):
+        with FakeTerminal():
+            self.assertEqual(islightmode(), True)
+            self.assertEqual(isdarkmode(), False)
+
+    def test_query(self):
+        with FakeTerminal(yx=(3, 4)) as ft:
+            self.assertEqual(query('yx', 'fgcolor', 'bgcolor'),
+                             ((3, 4), (0, 0, 0), (65535, 65535, 65535)))
+            self.assertEqual(ft.queries, 4)
+
+    def test_unsupported_fails_fast(self):
+        with FakeTerminal(silent=['bgcolor']):
+            start = time.time()
+            self.assertEqual(getbgcolor(), (-1, -1, -1))
+            self.assertTrue(time.time() - start < TIMEOUT / 10.0)
+
+    def test_silent(self):
+        with FakeTerminal(silent=['yx', 'da1']):
+            self.assertEqual(getyx(), (0, 0))
+
+    def test_getyx_text_mode(self):
+        with FakeTerminal(yx=(10, 5)):
+            if not textmode():
+                self.skipTest('requires text I/O on ttys')
+            self.assertEqual(getyx_text_mode(), (10, 5))
+
+    def test_getyx_text_mode_typeahead(self):
+        with FakeTerminal(yx=(10, 5)) as ft:
+            if not textmode():
+                self.skipTest('requires text I/O on ttys')
+            ft.type(b'ac') # Echoed, the column changes
+            self.assertEqual(getyx_text_mode()[0], 10)
+            self.assertEqual(readtypeahead(), b'ac')
+
+    def test_getyx_text_mode_fails_fast(self):
+        with FakeTerminal(silent=['yx']):
+            if not textmode():
+                self.skipTest('requires text I/O on ttys')
+            start = time.time()
+            self.assertEqual(getyx_text_mode(), (0, 0))
+            self.assertTrue(time.time() - start < TIMEOUT / 10.0)
+
+    def test_fragmented(self):
+        with FakeTerminal(yx=(10, 5), fragment=1):
+            self.assertEqual(query('yx', 'bgcolor'),
+                             ((10, 5), (65535, 65535, 65535)))
+
+    def test_trickle_cannot_stretch_timeout(self):
+        saved = term.TIMEOUT
+        term.TIMEOUT = 1
+        try:
+            with FakeTerminal(fragment=1, fragmentdelay=0.02):
+                start = time.time()
+                self.assertEqual(getyx(), (0, 0))
+                self.assertTrue(time.time() - start < 0.2)
+        finally:
+            term.TIMEOUT = saved
+
+    def test_float_timeout(self):
+        saved = term.TIMEOUT
+        term.TIMEOUT = 0.5
+        try:
+            with FakeTerminal(yx=(10, 5)):
+                self.assertEqual(getyx(), (10, 5))
+            with FakeTerminal(silent=['yx', 'da1']):
+                start = time.time()
+                self.assertEqual(getyx(), (0, 0))
+                self.assertTrue(time.time() - start < 0.1)
+        finally:
+            term.TIMEOUT = saved
+
+    def test_latency(self):
+        with FakeTerminal(yx=(10, 5), latency=0.01, jitter=0.01):
+            self.assertEqual(getyx(), (10, 5))
+
+    def test_terminal(self):
+        with FakeTerminal(yx=(10, 5)) as ft:
+            with Terminal(ft.device) as t:
+                self.assertEqual(t.getyx(), (10, 5))
+                self.assertEqual(t.islightmode(), True)
+
+    def test_terminal_is_unbuffered(self):
+        # select does not see data held in a stream buffer
+        with FakeTerminal() as ft:
+            with Terminal(ft.device) as t:
+                self.assertTrue(isinstance(t.tty, io.RawIOBase))
+
+    def test_typeahead(self):
+        with FakeTerminal(yx=(10, 5)) as ft:
+            ft.type(b'ab')
+            getyx()
+            self.assertEqual(readtypeahead(), b'ab')
+            self.assertEqual(readtypeahead(), b'')
+
+    def test_terminal_typeahead(self):
+        with FakeTerminal() as ft:
+            with Terminal(ft.device) as t:
+                ft.type(b'q\033[A')
+                t.getyx()
+                self.assertEqual(t.readtypeahead(), b'q\033[A')
+
+    def test_cursor_moves(self):
+        with FakeTerminal() as ft:
+            with Terminal(ft.device) as t:
+                t.tty.write(b'\033[5;10Hfoo')
+                self.assertEqual(t.getyx(), (5, 13))
+
+
+class IterRecordsTests(unittest.TestCase):
+
+    def records(self, stream, terminators):
+        return [bytes(x) for x in iterrecords(stream, terminators)]
+
+    def test_records(self):
+        self.assertEqual(self.records(BytesIO(b'a\nbb\nccc\n'), b'\n'),
+                         [b'a\n', b'bb\n', b'ccc\n'])
+
+    def test_last_record(self):
+        self.assertEqual(self.records(BytesIO(b'a\nbb'), b'\n'), [b'a\n', b'bb'])
+
+    def test_empty_stream(self):
+        self.assertEqual(self.records(BytesIO(b''), b'\n'), [])
+
+    def test_no_terminators(self):
+        self.assertEqual(self.records(ChunkedIO(b'abcde'), ()), [b'abcde'])
+
+    def test_first_terminator_wins(self):
+        self.assertEqual(self.records(BytesIO(b'xabcd'), (b'abc', b'b')), [b'xab', b'cd'])
+
+    def test_shared_suffix(self):
+        self.assertEqual(self.records(BytesIO(b'a\r\nb\nc'), (b'\r\n', b'\n')),
+                         [b'a\r\n', b'b\n', b'c'])
+
+    def test_terminator_spans_chunks(self):
+        stream = ChunkedIO(b'\033]11;rgb:ffff/ffff/ffff\033\\\033]10;?\007')
+        self.assertEqual(self.records(stream, (b'\033\\', b'\007')),
+                         [b'\033]11;rgb:ffff/ffff/ffff\033\\', b'\033]10;?\007'])
+
+    def test_terminator_does_not_span_records(self):
+        self.assertEqual(self.records(ChunkedIO(b'axb'), (b'ab', b'x')), [b'ax', b'b'])
+
+    @unittest.skipIf(sys.version_info[0] < 3, 'requires Python 3')
+    def test_memoryview(self):
+        records = list(iterrecords(BytesIO(b'a\nb\n'), b'\n'))
+        self.assertTrue(isinstance(records[0], memoryview))
+        self.assertEqual(bytes(records[1]), b'b\n')
+
+    def test_stringio(self):
+        self.assertEqual(list(iterrecords(StringIO('a;b;c'), ';')), ['a;', 'b;', 'c'])
+
+    def test_unicode_special_characters(self):
+        self.assertEqual(list(iterrecords(StringIO(u'a]b-c^d\\e'), (u']', u'-', u'^', u'\\'))),
+                         [u'a]', u'b-', u'c^', u'd\\', u'e'])
+
+    def test_close_keeps_rest(self):
+        stream = BytesIO(b'a\nbb\nccc')
+        it = iterrecords(stream, b'\n')
+        self.assertEqual(bytes(next(it)), b'a\n')
+        it.close()
+        self.assertEqual(readto(stream, b'\n'), b'bb\n')
+
+    def test_pushback(self):
+        stream = BytesIO(b'a\nbb\nccc')
+        self.assertEqual(readto(stream, b'\n'), b'a\n')
+        self.assertEqual(self.records(stream, b'\n'), [b'bb\n', b'ccc'])
+
+
+class MetricsTests(unittest.TestCase):
+
+    def tearDown(self):
+        disablemetrics()
+
+    def test_record(self):
+        m = Metrics()
+        m.record('write', 0.000003)
+        m.record('write', 0.001)
+        timing = m.export()['timings']['write']
+        self.assertEqual(timing['count'], 2)
+        self.assertEqual(timing['min'], 0.000003)
+        self.assertEqual(timing['max'], 0.001)
+        self.assertEqual(timing['buckets'], {4: 1, 1024: 1})
+
+    def test_percentile(self):
+        m = Metrics()
+        self.assertEqual(m.percentile('write', 0.5), None)
+        for _ in range(9):
+            m.record('write', 0.000003)
+        m.record('write', 0.001)
+        self.assertEqual(m.percentile('write', 0.5), 0.000004)
+        self.assertEqual(m.percentile('write', 1), 0.001)
+
+    def test_hooks(self):
+        calls = []
+        m = Metrics()
+        m.addhook(lambda name, value: calls.append(name))
+        m.record('write', 0.1)
+        m.count('queries')
+        self.assertEqual(calls, ['write', 'queries'])
+
+    def test_query(self):
+        m = enablemetrics()
+        with FakeTerminal(yx=(10, 5)):
+            getyx()
+        export = m.export()
+        self.assertEqual(sorted(export['timings']),
+            ['firstbyte', 'mode', 'open', 'reply', 'restore', 'total', 'write'])
+        self.assertEqual(export['counters']['queries'], 1)
+        self.assertEqual(export['counters']['bytesread'], len(b'\033[10;5R\033[?62;22c'))
+        self.assertFalse('timeouts' in export['counters'])
+
+    def test_timeout(self):
+        m = enablemetrics()
+        with FakeTerminal(silent=['yx', 'da1']):
+            getyx()
+        self.assertEqual(m.counters['timeouts'], 1)
+        self.assertFalse('reply' in m.timings)
+
+    def test_parsefailures(self):
+        m = enablemetrics()
+        _query(FakeTTY(b'\033]99;x\007\033[24;1R'), ('yx',))
+        self.assertEqual(m.counters['parsefailures'], 1)
+
+    def test_latereplies(self):
+        m = enablemetrics()
+        _query(FakeTTY(b'\033]11;rgb:ffff/ffff/ffff\007\033[24;1R'), ('yx',))
+        self.assertEqual(m.counters['latereplies'], 1)
+
+    def test_terminal(self):
+        m = enablemetrics()
+        with FakeTerminal() as ft:
+            with Terminal(ft.device) as t:
+                t.getyx()
+        self.assertEqual(sorted(m.timings),
+            ['firstbyte', 'mode', 'open', 'reply', 'restore', 'total', 'write'])
+
+
+class AdaptiveTimeoutTests(unittest.TestCase):
+
+    def tearDown(self):
+        disableadaptivetimeout()
+
+    def test_initial(self):
+        self.assertEqual(AdaptiveTimeout().timeout(), TIMEOUT / 10.0)
+        self.assertEqual(AdaptiveTimeout(ceiling=0.1).timeout(), 0.1)
+
+    def test_update(self):
+        link = AdaptiveTimeout(floor=0)
+        link.update(0.1)
+        self.assertAlmostEqual(link.timeout(), 0.3)
+        link.update(0.1)
+        self.assertAlmostEqual(link.srtt, 0.1)
+        self.assertAlmostEqual(link.rttvar, 0.0375)
+        self.assertAlmostEqual(link.timeout(), 0.25)
+
+    def test_floor_and_ceiling(self):
+        link = AdaptiveTimeout(floor=0.01, ceiling=0.5)
+        link.update(0.0001)
+        self.assertEqual(link.timeout(), 0.01)
+        link.update(10)
+        self.assertEqual(link.timeout(), 0.5)
+
+    def test_backoff(self):
+        link = AdaptiveTimeout(floor=0.01, ceiling=0.5)
+        link.update(0.0001)
+        link.backoff()
+        self.assertEqual(link.timeout(), 0.02)
+        for _ in range(10):
+            link.backoff()
+        self.assertEqual(link.timeout(), 0.5)
+
+    def test_skips_stale_da1(self):
+        link = AdaptiveTimeout()
+        _query(FakeTTY(b''), ('yx',), link=link)
+        self.assertEqual(len(link.outstanding), 1)
+        tty = FakeTTY(b'\033[?62;22c\033[24;1R\033[?62;22c')
+        self.assertEqual(_query(tty, ('yx',), link=link)['yx'], (24, 1))
+        self.assertEqual(tty.written, b'\033[6n\033[c')
+        self.assertEqual(link.outstanding, [])
+        # The round trip is ambiguous
+        self.assertEqual(link.srtt, None)
+        _query(FakeTTY(b'\033[?62;22c'), ('yx',), link=link)
+        self.assertNotEqual(link.srtt, None)
+
+    def test_drops_late_replies(self):
+        link = AdaptiveTimeout()
+        _query(FakeTTY(b''), ('yx',), link=link)
+        tty = FakeTTY(b'\033[1;1R\033[?62;22c\033[5;5R\033[?62;22c')
+        self.assertEqual(_query(tty, ('yx',), link=link)['yx'], (5, 5))
+
+    def test_late_reply_after_timeout(self):
+        saved = term.TIMEOUT
+        term.TIMEOUT = 1
+        try:
+            with FakeTerminal(latency=0.15) as ft:
+                self.assertEqual(getyx(), (0, 0))
+                ft.yx = [5, 5]
+                ft.latency = 0
+                self.assertEqual(getyx(), (5, 5))
+        finally:
+            term.TIMEOUT = saved
+
+    def test_stale_da1_expires(self):
+        link = AdaptiveTimeout(ceiling=0.01)
+        _query(FakeTTY(b''), ('yx',), link=link)
+        time.sleep(max(0.01, TIMEOUT / 10.0))
+        tty = FakeTTY(b'\033[24;1R\033[?62;22c')
+        self.assertEqual(_query(tty, ('yx',), link=link)['yx'], (24, 1))
+        self.assertEqual(link.outstanding, [])
+
+    def test_gettimeout(self):
+        with FakeTerminal(yx=(10, 5)):
+            self.assertEqual(gettimeout(), TIMEOUT / 10.0)
+            enableadaptivetimeout(floor=0.001, ceiling=1.0)
+            self.assertEqual(getyx(), (10, 5))
+            self.assertTrue(gettimeout() < TIMEOUT / 10.0)
+
+    def test_slow_terminal(self):
+        enableadaptivetimeout(floor=0.001, ceiling=1.0)
+        with FakeTerminal(yx=(10, 5)) as ft:
+            getyx()
+            ft.latency = 0.05
+            # The first slow query times out, the timeout backs off
+            for _ in range(8):
+                yx = getyx()
+            self.assertEqual(yx, (10, 5))
+            self.assertTrue(gettimeout() > 0.05)
+
+
+class CacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = CapabilityCache()
+
+    def test_get_set(self):
+        self.assertEqual(self.cache.get('/dev/tty', 'numcolors'), None)
+        self.cache.set('/dev/tty', 'numcolors', 256)
+        self.assertEqual(self.cache.get('/dev/tty', 'numcolors'), 256)
+        self.assertEqual(self.cache.get('/dev/pts/1', 'numcolors'), None)
+
+    def test_keyed_by_term(self):
+        with setterm('xterm-256color'):
+            self.cache.set('/dev/tty', 'numcolors', 256)
+        with setterm('vt100'):
+            self.assertEqual(self.cache.get('/dev/tty', 'numcolors'), None)
+        with setterm('xterm-256color'):
+            self.assertEqual(self.cache.get('/dev/tty', 'numcolors'), 256)
+
+    def test_ttl(self):
+        self.cache.ttl = -1
+        self.cache.set('/dev/tty', 'numcolors', 256)
+        self.assertEqual(self.cache.get('/dev/tty', 'numcolors'), None)
+        self.assertEqual(self.cache.entries, {})
+
+    def test_invalidate(self):
+        self.cache.set('/dev/tty', 'numcolors', 256)
+        self.cache.set('/dev/tty', 'bgcolor', (0, 0, 0))
+        self.cache.invalidate('bgcolor')
+        self.assertEqual(self.cache.get('/dev/tty', 'numcolors'), 256)
+        self.assertEqual(self.cache.get('/dev/tty', 'bgcolor'), None)
+        self.cache.invalidate()
+        self.assertEqual(self.cache.entries, {})
+
+    def test_hooks(self):
+        calls = []
+        self.cache.addhook(calls.append)
+        self.cache.invalidate('fgcolor', 'bgcolor')
+        self.cache.removehook(calls.append)
+        self.cache.invalidate()
+        self.assertEqual(calls, [('fgcolor', 'bgcolor')])
+
+    def test_query_uses_cache(self):
+        cache = enablecache()
+        try:
+            with setterm('xterm'):
+                cache.set('/dev/tty', 'bgcolor', (1, 2, 3))
+                cache.set('/dev/tty', 'fgcolor', (4, 5, 6))
+                self.assertEqual(query('bgcolor', 'fgcolor'), ((1, 2, 3), (4, 5, 6)))
+                invalidatecache('bgcolor')
+                self.assertEqual(cache.get('/dev/tty', 'bgcolor'), None)
+        finally:
+            disablecache()
+
+
+class SharedCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_shared(self):
+        a = SharedCapabilityCache(directory=self.dir)
+        b = SharedCapabilityCache(directory=self.dir)
+        a.set('/dev/tty', 'bgcolor', (1, 2, 3))
+        self.assertEqual(b.get('/dev/tty', 'bgcolor'), (1, 2, 3))
+
+    def test_merge(self):
+        a = SharedCapabilityCache(directory=self.dir)
+        b = SharedCapabilityCache(directory=self.dir)
+        a.set('/dev/tty', 'bgcolor', (1, 2, 3))
+        b.set('/dev/tty', 'numcolors', 256)
+        c = SharedCapabilityCache(directory=self.dir)
+        self.assertEqual(c.get('/dev/tty', 'bgcolor'), (1, 2, 3))
+        self.assertEqual(c.get('/dev/tty', 'numcolors'), 256)
+
+    def test_update(self):
+        a = SharedCapabilityCache(directory=self.dir)
+        a.update('/dev/tty', {'fgcolor': (1, 2, 3), 'bgcolor': (4, 5, 6)})
+        b = SharedCapabilityCache(directory=self.dir)
+        self.assertEqual(b.get('/dev/tty', 'fgcolor'), (1, 2, 3))
+        self.assertEqual(b.get('/dev/tty', 'bgcolor'), (4, 5, 6))
+
+    def test_query_saves_once(self):
+        cache = term._cache = CountingCache(directory=self.dir)
+        try:
+            with FakeTerminal(palette={15: (1, 2, 3)}) as ft:
+                self.assertEqual(len(getpalette(16)), 48)
+        finally:
+            disablecache()
+        self.assertEqual(cache.saves, 1)
+        b = SharedCapabilityCache(directory=self.dir)
+        self.assertEqual(b.get(ft.device, 'color15'), (1, 2, 3))
+
+    def test_invalidate(self):
+        a = SharedCapabilityCache(directory=self.dir)
+        a.set('/dev/tty', 'bgcolor', (1, 2, 3))
+        b = SharedCapabilityCache(directory=self.dir)
+        b.invalidate('bgcolor')
+        c = SharedCapabilityCache(directory=self.dir)
+        self.assertEqual(c.get('/dev/tty', 'bgcolor'), None)
+
+    def test_other_session(self):
+        a = SharedCapabilityCache(directory=self.dir)
+        a.set('/dev/tty', 'bgcolor', (1, 2, 3))
+        b = SharedCapabilityCache(directory=self.dir)
+        b.session = 'other'
+        self.assertEqual(b.get('/dev/tty', 'bgcolor'), None)
+
+    def test_corrupt_file(self):
+        a = SharedCapabilityCache(directory=self.dir)
+        with open(a.path, 'wt') as f:
+            f.write('{foo')
+        self.assertEqual(a.get('/dev/tty', 'bgcolor'), None)
+
+    def test_not_shared(self):
+        a = SharedCapabilityCache()
+        a.directory = ''
+        self.assertEqual(a.path, None)
+        a.set('/dev/tty', 'bgcolor', (1, 2, 3))
+        self.assertEqual(a.get('/dev/tty', 'bgcolor'), (1, 2, 3))
+
+
+class PaletteTests(unittest.TestCase):
+
+    def test_getpalette(self):
+        palette = dict((i, (i, i * 2, i * 3)) for i in range(16))
+        with FakeTerminal(palette=palette):
+            colors = getpalette()
+        self.assertEqual(len(colors), 48)
+        self.assertEqual(list(colors[:6]), [0, 0, 0, 1, 2, 3])
+        self.assertEqual(list(colors[45:]), [15, 30, 45])
+
+    def test_256_colors_one_round_trip(self):
+        palette = dict((i, (i, i, i)) for i in range(256))
+        with FakeTerminal(palette=palette, latency=0.05):
+            start = time.time()
+            colors = getpalette(256)
+            self.assertTrue(time.time() - start < 0.2)
+        self.assertEqual(len(colors), 768)
+        self.assertEqual(list(colors[765:]), [255, 255, 255])
+
+    def test_missing_colors(self):
+        with FakeTerminal(palette={1: (1, 1, 1)}):
+            self.assertEqual(list(getpalette(3)), [-1, -1, -1, 1, 1, 1, -1, -1, -1])
+
+    def test_terminal(self):
+        with FakeTerminal(palette={0: (7, 8, 9)}):
+            with Terminal() as t:
+                self.assertEqual(list(t.getpalette(1)), [7, 8, 9])
+
+    def test_reply_formats(self):
+        names = ['color%d' % i for i in range(7)]
+        pending = _pending(names)
+        results = {}
+        buf = (b'\033]4;6;#fff\033\\'
+               b'\033]4;0;rgb:f/8/0\007'
+               b'\033]4;1;rgb:ff/80/00\007'
+               b'\033]4;2;rgb:fff/800/000\007'
+               b'\033]4;3;rgb:ffff/8000/0000\007'
+               b'\033]4;4;rgba:ffff/8000/0000/ffff\007'
+               b'\033]4;5;#ff8000\007'
+               b'\033[?62c')
+        _scanreplies(buf, pending, results)
+        self.assertEqual(pending, [])
+        self.assertEqual(results['color0'], (65535, 34952, 0))
+        self.assertEqual(results['color1'], (65535, 32896, 0))
+        self.assertEqual(results['color2'], (65535, 32775, 0))
+        self.assertEqual(results['color3'], (65535, 32768, 0))
+        self.assertEqual(results['color4'], (65535, 32768, 0))
+        self.assertEqual(results['color5'], (65535, 32896, 0))
+        self.assertEqual(results['color6'], (65535, 65535, 65535))
+
+    def test_replies_in_any_order(self):
+        pending = _pending(['color%d' % i for i in range(256)])
+        results = {}
+        buf = b''.join(b'\033]4;%d;rgb:00/00/%02x\007' % (i, i) for i in range(255, -1, -1))
+        _scanreplies(buf + b'\033]4;256;rgb:0/0/0\007\033[?62c', pending, results)
+        self.assertEqual(pending, [])
+        self.assertEqual(len([x for x in results if x.startswith('color')]), 256)
+        self.assertEqual(results['color255'], (0, 0, 65535))
+        self.assertEqual(results['color1'], (0, 0, 257))
+
+    def test_unpending_color(self):
+        pending = _pending(['color1'])
+        results = {}
+        _scanreplies(b'\033]4;2;rgb:f/f/f\007\033]4;1;rgb:0/0/0\007', pending, results)
+        self.assertEqual(pending, ['da1'])
+        self.assertEqual(results, {'color1': (0, 0, 0)})
+
+    def test_too_many_colors(self):
+        self.assertRaises(ValueError, getpalette, 257)
+        with FakeTerminal():
+            with Terminal() as t:
+                self.assertRaises(ValueError, t.getpalette, 257)
+
+
+class SizeTests(unittest.TestCase):
+
+    def setUp(self):
+        invalidatesize()
+
+    def tearDown(self):
+        invalidatesize()
+
+    def test_ioctl(self):
+        with FakeTerminal(size=(40, 132), pixelsize=(800, 1188)) as ft:
+            self.assertEqual(getsize(), (40, 132))
+            self.assertEqual(getpixelsize(), (800, 1188))
+            self.assertEqual(ft.queries, 0)
+
+    def test_probe(self):
+        with FakeTerminal(yx=(3, 4), size=(30, 100), winsize=False) as ft:
+            self.assertEqual(getsize(), (30, 100))
+            self.assertEqual(getpixelsize(), (0, 0))
+            self.assertEqual(ft.queries, 2) # yx, da1
+            # The cursor is restored
+            self.assertEqual(getyx(), (3, 4))
+
+    def test_cached(self):
+        with FakeTerminal(size=(30, 100), winsize=False) as ft:
+            getsize()
+            queries = ft.queries
+            getsize()
+            self.assertEqual(ft.queries, queries)
+
+    def test_sigwinch(self):
+        with FakeTerminal(size=(40, 132)) as ft:
+            self.assertEqual(getsize(), (40, 132))
+            ft.resize((50, 160))
+            self.assertEqual(getsize(), (40, 132))
+            os.kill(os.getpid(), signal.SIGWINCH)
+            self.assertEqual(getsize(), (50, 160))
+
+    def test_sigwinch_replaced(self):
+        with FakeTerminal(size=(40, 132)) as ft:
+            self.assertEqual(getsize(), (40, 132))
+            saved = signal.signal(signal.SIGWINCH, lambda signum, frame: None)
+            try:
+                ft.resize((50, 100))
+                os.kill(os.getpid(), signal.SIGWINCH)
+                self.assertEqual(getsize(), (50, 100))
+                ft.resize((60, 120))
+                self.assertEqual(getsize(), (60, 120))
+            finally:
+                signal.signal(signal.SIGWINCH, saved)
+
+    def test_no_reply(self):
+        with FakeTerminal(winsize=False, silent=['yx', 'da1']):
+            self.assertEqual(getsize(), (0, 0))
+
+    def test_bad_device(self):
+        with Terminal('/dev/foobar') as t:
+            self.assertEqual(t.getsize(), (0, 0))
+            self.assertEqual(t.getpixelsize(), (0, 0))
+
+    def test_terminal(self):
+        with FakeTerminal(size=(30, 100), winsize=False) as ft:
+            with Terminal() as t:
+                self.assertEqual(t.getsize(), (30, 100))
+                queries = ft.queries
+                self.assertEqual(t.getsize(), (30, 100))
+            self.assertEqual(getsize(), (30, 100))
+            self.assertEqual(ft.queries, queries)
+
+
 class TermTests(unittest.TestCase):
     # pylint: disable=too-many-public-methods
 
@@ -247,6 +1006,34 @@ class TermTests(unittest.TestCase):
         stream = BytesIO(b'')
         self.assertEqual(readto(stream, b'3'), b'')
 
+    def test_readto_keeps_pushback(self):
+        stream = BytesIO(b'123456789')
+        self.assertEqual(readto(stream, b'3'), b'123')
+        self.assertEqual(readto(stream, b'6'), b'456')
+        self.assertEqual(readto(stream, b''), b'789')
+
+    def test_readto_rewinds_seekable_stream(self):
+        stream = BytesIO(b'line1\nline2\n')
+        self.assertEqual(readto(stream, b'\n'), b'line1\n')
+        self.assertEqual(stream.read(), b'line2\n')
+
+    def test_readto_rewinds_file(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b'line1\nline2\nline3\n')
+            f.seek(0)
+            self.assertEqual(readto(f, b'\n'), b'line1\n')
+            self.assertEqual(f.readline(), b'line2\n')
+            self.assertEqual(readto(f, b'\n'), b'line3\n')
+
+    def test_readto_suffix_spans_chunks(self):
+        stream = ChunkedIO(b'123456789')
+        self.assertEqual(readto(stream, b'345'), b'12345')
+        self.assertEqual(readto(stream, (b'89', b'78')), b'678')
+
+    def test_readto_first_suffix_wins(self):
+        stream = BytesIO(b'\033]11;rgb:ffff/ffff/ffff\033\\')
+        self.assertEqual(readto(stream, (b'\033\\', b'/')), b'\033]11;rgb:ffff/')
+
     def test_stringio_readto_3(self):
         stream = StringIO('123456789')
         self.assertEqual(readto(stream, '3'), '123')
@@ -263,6 +1050,21 @@ class TermTests(unittest.TestCase):
         stream = StringIO('123456789')
         self.assertEqual(readto(stream, ''), '123456789')
 
+    def test_stringio_readto_rewinds(self):
+        stream = StringIO('123456789')
+        self.assertEqual(readto(stream, '3'), '123')
+        self.assertEqual(stream.read(), '456789')
+
+    def test_stringio_textyx(self):
+        stream = StringIO('c\033[10;5Rx\033[?62;22c')
+        self.assertEqual(_textyx(stream, '/dev/textyx'), (10, 5))
+        self.assertEqual(readtypeahead('/dev/textyx'), b'cx')
+
+    def test_stringio_textyx_timeout(self):
+        stream = StringIO('abc')
+        self.assertEqual(_textyx(stream, '/dev/textyx'), (0, 0))
+        self.assertEqual(readtypeahead('/dev/textyx'), b'abc')
+
     def test_stringio_readto_end_if_empty_stopchar_in_tuple(self):
         stream = StringIO('123456789')
         self.assertEqual(readto(stream, ('',)), '123456789')
@@ -291,6 +1093,46 @@ class TermTests(unittest.TestCase):
         stream = BytesIO(b'\033]10;rgb:00ff/ff00/0gg0\007')
         self.assertEqual(_readcolor(stream), (-1, -1, -1))
 
+    def test__query(self):
+        tty = FakeTTY(b'\033]11;rgb:ffff/ffff/ffff\007\033[24;1R')
+        self.assertEqual(_query(tty, ('yx', 'bgcolor')),
+                         {'yx': (24, 1), 'bgcolor': (65535, 65535, 65535)})
+        self.assertEqual(tty.written, b'\033[6n\033]11;?\007\033[c')
+
+    def test__query_no_reply(self):
+        tty = FakeTTY(b'\033[24;1R')
+        self.assertEqual(_query(tty, ('fgcolor', 'yx')), {'yx': (24, 1)})
+
+    def test__query_skips_noise(self):
+        tty = FakeTTY(b'abc\033[A\033]10;rgb:0000/0000/0000\033\\')
+        self.assertEqual(_query(tty, ('fgcolor',)), {'fgcolor': (0, 0, 0)})
+
+    def test__query_timeout_without_fileno(self):
+        tty = FakeTTY(b'\033[24;1R')
+        self.assertEqual(_query(tty, ('yx',), timeout=0.01), {'yx': (24, 1)})
+
+    def test__query_same_name_twice(self):
+        tty = FakeTTY(b'\033[24;1R')
+        self.assertEqual(_query(tty, ('yx', 'yx')), {'yx': (24, 1)})
+        self.assertEqual(tty.written, b'\033[6n\033[c')
+
+    def test__query_stops_at_da1(self):
+        tty = FakeTTY(b'\033[?62;22c789')
+        self.assertEqual(_query(tty, ('yx', 'da1')), {'da1': (62, 22)})
+        self.assertEqual(readto(tty, b'9'), b'789')
+
+    def test__query_typeahead(self):
+        tty = FakeTTY(b'a\033[Ab\033[24;1Rc\033OP\033[?62;22cd')
+        typeahead = bytearray()
+        self.assertEqual(_query(tty, ('yx',), typeahead), {'yx': (24, 1), 'da1': (62, 22)})
+        self.assertEqual(typeahead, b'a\033[Abc\033OPd')
+
+    def test__query_typeahead_drops_late_replies(self):
+        tty = FakeTTY(b'a\033]11;rgb:ffff/ffff/ffff\007b\033[24;1R')
+        typeahead = bytearray()
+        self.assertEqual(_query(tty, ('yx',), typeahead), {'yx': (24, 1)})
+        self.assertEqual(typeahead, b'ab')
+
     def test_luminance_black(self):
         self.assertEqual(luminance((0, 0, 0)), 0)
 
@@ -317,6 +1159,32 @@ class TermTests(unittest.TestCase):
     def test_isdarkmode(self):
         self.assertNotEqual(isdarkmode(), None)
 
+    def test_terminal(self):
+        with Terminal() as t:
+            self.assertNotEqual(t.tty, None)
+            mode = tcgetattr(t.tty)
+            self.assertEqual(mode[LFLAG] & ECHO, 0)
+            self.assertEqual(mode[LFLAG] & ICANON, 0)
+            self.assertEqual(int_(mode[CC][VMIN]), 0)
+        self.assertEqual(t.tty, None)
+        self.test_defaults()
+
+    def test_terminal_close_twice(self):
+        t = Terminal()
+        t.close()
+        t.close()
+        self.assertEqual(t.tty, None)
+
+    def test_terminal_bad_device(self):
+        with Terminal('/dev/foobar') as t:
+            self.assertEqual(t.tty, None)
+            self.assertEqual(t.getyx(), (0, 0))
+            self.assertEqual(t.getbgcolor(), (-1, -1, -1))
+            self.assertEqual(t.islightmode(), None)
+
+    def test_terminal_raises_on_bad_fd(self):
+        self.assertRaises(termios.error, Terminal, '/dev/null')
+
     def test_isxterm(self):
         with setterm('xterm-color'):
             self.assertEqual(isxterm(), True)
@@ -0,0 +1,217 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from term import opentty, getnumcolors, Terminal
+from term import _getnumcolors
+from term.terminfo import parse, load, find, clearcache, MAGIC, MAGIC32
+from term.terminfo import _BOOLNAMES, _NUMNAMES, _STRNAMES
+
+
+def compile_entry(names, bools=(), nums=(), strs=(), ext=None, magic=MAGIC):
+    # Build a compiled entry as described in term(5)
+    # pylint: disable=too-many-arguments,too-many-positional-arguments,too-many-locals
+    numfmt = 'h' if magic == MAGIC else 'i'
+    bools = dict.fromkeys(bools, True)
+    nums = dict(nums)
+    strs = dict(strs)
+
+    def section(boolnames, numnames, strnames, extnames=()):
+        b = bytes(bytearray(1 if x in bools else 0 for x in boolnames))
+        n = struct.pack('<%d%s' % (len(numnames), numfmt), *[nums.get(x, -1) for x in numnames])
+        table = b''
+        offsets = []
+        for x in strnames:
+            if x in strs:
+                offsets.append(len(table))
+                table += strs[x] + b'\0'
+            else:
+                offsets.append(-1)
+        base = len(table)
+        for x in extnames:
+            offsets.append(len(table) - base)
+            table += x.encode() + b'\0'
+        return b, n, struct.pack('<%dh' % len(offsets), *offsets), table
+
+    boolnames = _BOOLNAMES[:max([_BOOLNAMES.index(x) + 1 for x in bools
+                                 if x in _BOOLNAMES] or [0])]
+    numnames = _NUMNAMES[:max([_NUMNAMES.index(x) + 1 for x in nums
+                               if x in _NUMNAMES] or [0])]
+    strnames = _STRNAMES[:max([_STRNAMES.index(x) + 1 for x in strs
+                               if x in _STRNAMES] or [0])]
+    namedata = '|'.join(names).encode() + b'\0'
+    b, n, o, table = section(boolnames, numnames, strnames)
+    if (len(namedata) + len(b)) % 2:
+        b += b'\0'
+    data = struct.pack('<6h', magic, len(namedata), len(boolnames), len(numnames),
+                       len(strnames), len(table)) + namedata + b + n + o + table
+    if ext:
+        eb, en, es = ext
+        if len(data) % 2:
+            data += b'\0'
+        b, n, o, table = section(eb, en, es, list(eb) + list(en) + list(es))
+        if len(b) % 2:
+            b += b'\0'
+        # Like ncurses, count the strings present plus the names
+        nitems = len([x for x in es if x in strs]) + len(eb) + len(en) + len(es)
+        data += struct.pack('<5h', len(eb), len(en), len(es), nitems, len(table))
+        data += b + n + o + table
+    return data
+
+
+class ParseTests(unittest.TestCase):
+
+    def test_legacy(self):
+        entry = parse(compile_entry(['xterm', 'X11 terminal'], ['am', 'xenl'],
+                                    {'colors': 8, 'cols': 80},
+                                    {'bel': b'\007', 'setaf': b'\033[3%p1%dm'}))
+        self.assertEqual(entry.names, ['xterm', 'X11 terminal'])
+        self.assertEqual(entry.getflag('am'), True)
+        self.assertEqual(entry.getflag('bw'), False)
+        self.assertEqual(entry.getnum('colors'), 8)
+        self.assertEqual(entry.getnum('lines'), -1)
+        self.assertEqual(entry.getstr('bel'), b'\007')
+        self.assertEqual(entry.getstr('setaf'), b'\033[3%p1%dm')
+        self.assertEqual(entry.getstr('cup'), None)
+
+    def test_odd_names_are_padded(self):
+        entry = parse(compile_entry(['ab'], ['bw'], {'cols': 80}))
+        self.assertEqual(entry.getnum('cols'), 80)
+        entry = parse(compile_entry(['abc'], ['bw'], {'cols': 80}))
+        self.assertEqual(entry.getnum('cols'), 80)
+
+    def test_32bit_numbers(self):
+        entry = parse(compile_entry(['xterm-direct'], (), {'colors': 0x1000000}, magic=MAGIC32))
+        self.assertEqual(entry.getnum('colors'), 0x1000000)
+
+    def test_extended(self):
+        entry = parse(compile_entry(['kitty'], ['am'], {'colors': 256}, {'bel': b'\007'},
+                                    ext=(['Tc', 'fullkbd'], ['U8'], ['Ms', 'Smulx'])))
+        self.assertEqual(entry.getflag('Tc'), False)
+        entry = parse(compile_entry(['kitty'], ['am', 'Tc'], {'colors': 256, 'U8': 1},
+                                    {'bel': b'\007', 'Smulx': b'\033[4:%p1%dm'},
+                                    ext=(['Tc', 'fullkbd'], ['U8'], ['Ms', 'Smulx'])))
+        self.assertEqual(entry.getflag('Tc'), True)
+        self.assertEqual(entry.getflag('fullkbd'), False)
+        self.assertEqual(entry.getnum('U8'), 1)
+        self.assertEqual(entry.getstr('Ms'), None)
+        self.assertEqual(entry.getstr('Smulx'), b'\033[4:%p1%dm')
+        self.assertEqual(entry.getstr('bel'), b'\007')
+
+    def test_extended_absent_string(self):
+        entry = parse(compile_entry(['ms-terminal'], ['am', 'AX', 'XT'], (),
+                                    {'bel': b'\007', 'xm': b'\033[<%p1%dM'},
+                                    ext=(['AX', 'XT'], [], ['E3', 'Ms', 'xm'])))
+        self.assertEqual(entry.getflag('AX'), True)
+        self.assertEqual(entry.getflag('XT'), True)
+        self.assertEqual(entry.getflag('xm'), False)
+        self.assertEqual(entry.getstr('E3'), None)
+        self.assertEqual(entry.getstr('Ms'), None)
+        self.assertEqual(entry.getstr('xm'), b'\033[<%p1%dM')
+
+    def test_system_extended(self):
+        path = find('screen.xterm-256color')
+        if path is None:
+            self.skipTest('screen.xterm-256color not installed')
+        with open(path, 'rb') as f:
+            entry = parse(f.read())
+        self.assertEqual(entry.getflag('AX'), True)
+        self.assertEqual(entry.getflag('xm'), False)
+        self.assertNotEqual(entry.getstr('xm'), None)
+
+    def test_bad_magic(self):
+        self.assertRaises(ValueError, parse, b'\x00\x00' + compile_entry(['x'])[2:])
+
+    def test_truncated(self):
+        data = compile_entry(['xterm'], ['am'], {'colors': 8}, {'bel': b'\007'})
+        self.assertRaises(ValueError, parse, data[:-3])
+        self.assertRaises(ValueError, parse, data[:5])
+
+
+class LoadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.saved = dict((k, os.environ.get(k)) for k in ('TERMINFO', 'TERMINFO_DIRS'))
+        clearcache()
+
+    def tearDown(self):
+        for k, v in self.saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        shutil.rmtree(self.dir)
+        clearcache()
+
+    def install(self, subdir, name, data):
+        d = os.path.join(self.dir, subdir)
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        with open(os.path.join(d, name), 'wb') as f:
+            f.write(data)
+
+    def test_terminfo(self):
+        self.install('f', 'foo-term', compile_entry(['foo-term'], (), {'colors': 88}))
+        os.environ['TERMINFO'] = self.dir
+        self.assertEqual(find('foo-term'), os.path.join(self.dir, 'f', 'foo-term'))
+        self.assertEqual(load('foo-term').getnum('colors'), 88)
+
+    def test_terminfo_dirs(self):
+        self.install('66', 'foo-term', compile_entry(['foo-term'], (), {'colors': 88}))
+        os.environ.pop('TERMINFO', None)
+        os.environ['TERMINFO_DIRS'] = '/nonexistent:' + self.dir
+        self.assertEqual(load('foo-term').getnum('colors'), 88)
+
+    def test_not_found(self):
+        os.environ['TERMINFO'] = self.dir
+        self.assertEqual(load('foo-term'), None)
+        self.assertEqual(load('../foo-term'), None)
+        self.assertEqual(load(''), None)
+
+    def test_bad_entry(self):
+        self.install('f', 'foo-term', b'garbage')
+        os.environ['TERMINFO'] = self.dir
+        self.assertEqual(load('foo-term'), None)
+
+    def test_cache(self):
+        self.install('f', 'foo-term', compile_entry(['foo-term'], (), {'colors': 88}))
+        os.environ['TERMINFO'] = self.dir
+        entry = load('foo-term')
+        self.install('f', 'foo-term', compile_entry(['foo-term'], (), {'colors': 8}))
+        self.assertTrue(load('foo-term') is entry)
+        clearcache()
+        self.assertEqual(load('foo-term').getnum('colors'), 8)
+
+    def test_system_entry(self):
+        os.environ.pop('TERMINFO', None)
+        os.environ.pop('TERMINFO_DIRS', None)
+        if find('xterm-256color') is None:
+            self.skipTest('xterm-256color not installed')
+        self.assertEqual(load('xterm-256color').getnum('colors'), 256)
+
+    def test_getnumcolors(self):
+        self.install('f', 'foo-term', compile_entry(['foo-term'], (), {'colors': 88}))
+        os.environ['TERMINFO'] = self.dir
+        saved = os.environ.get('TERM')
+        os.environ['TERM'] = 'foo-term'
+        try:
+            self.assertEqual(_getnumcolors(None), 88)
+        finally:
+            os.environ['TERM'] = saved or ''
+
+    def test_getnumcolors_without_tty(self):
+        self.install('f', 'foo-term', compile_entry(['foo-term'], (), {'colors': 88}))
+        os.environ['TERMINFO'] = self.dir
+        saved = os.environ.get('TERM'), opentty.device
+        os.environ['TERM'] = 'foo-term'
+        opentty.device = '/dev/foobar'
+        try:
+            self.assertEqual(getnumcolors(), 88)
+            with Terminal() as t:
+                self.assertEqual(t.getnumcolors(), 88)
+        finally:
+            os.environ['TERM'] = saved[0] or ''
+            opentty.device = saved[1]
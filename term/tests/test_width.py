@@ -0,0 +1,100 @@
+import unittest
+
+from term import enablecache, disablecache, getyx, Terminal
+from term.width import wcwidth, wcswidth, wcswidths, calibrate
+from term.width import _ZERO, _WIDE, _AMBIGUOUS, _GROUPS, _setambiguous
+from term.testing import FakeTerminal
+
+
+class WidthTests(unittest.TestCase):
+
+    def test_ascii(self):
+        self.assertEqual(wcwidth(u'a'), 1)
+        self.assertEqual(wcswidth(u'hello world'), 11)
+        self.assertEqual(wcswidth(u''), 0)
+
+    def test_controls(self):
+        self.assertEqual(wcwidth(u'\0'), 0)
+        self.assertEqual(wcwidth(u'\t'), -1)
+        self.assertEqual(wcwidth(u'\x7f'), -1)
+        self.assertEqual(wcwidth(u'\x9b'), -1)
+        self.assertEqual(wcswidth(u'abc\n'), -1)
+        self.assertEqual(wcswidth(u'\u4e2d\n'), -1)
+
+    def test_wide(self):
+        self.assertEqual(wcwidth(u'\u4e2d'), 2)
+        self.assertEqual(wcwidth(u'\uff21'), 2)
+        self.assertEqual(wcwidth(u'\U0001f600'), 2)
+        self.assertEqual(wcwidth(u'\U00020000'), 2)
+        self.assertEqual(wcswidth(u'\u4e2d\u6587abc'), 7)
+
+    def test_zero(self):
+        self.assertEqual(wcwidth(u'\u0301'), 0)
+        self.assertEqual(wcwidth(u'\u200b'), 0)
+        self.assertEqual(wcwidth(u'\u1160'), 0)
+        self.assertEqual(wcwidth(u'\u00ad'), 1)
+        self.assertEqual(wcswidth(u'e\u0301'), 1)
+
+    def test_zwj_sequences(self):
+        family = u'\U0001f468\u200d\U0001f469\u200d\U0001f467'
+        self.assertEqual(wcswidth(family), 2)
+        self.assertEqual(wcswidth(family + family), 4)
+        self.assertEqual(wcswidth(u'\U0001f44d\U0001f3fd'), 2)
+        self.assertEqual(wcswidth(u'a\u200d\u4e2d'), 3)
+
+    def test_ambiguous(self):
+        self.assertEqual(wcwidth(u'\u03b1'), 1)
+        self.assertEqual(wcwidth(u'\u2500'), 1)
+
+    def test_batch(self):
+        strings = [u'abc', u'\u4e2d', u'e\u0301', u'a\tb', u'']
+        self.assertEqual(wcswidths(strings), [3, 2, 1, -1, 0])
+        self.assertEqual(wcswidths(strings), [wcswidth(s) for s in strings])
+
+    def test_tables_sorted(self):
+        for table in (_ZERO, _WIDE, _AMBIGUOUS):
+            self.assertEqual(len(table) % 2, 0)
+            self.assertEqual(list(table), sorted(set(table)))
+
+
+class CalibrateTests(unittest.TestCase):
+
+    def tearDown(self):
+        _setambiguous((1,) * len(_GROUPS))
+        disablecache()
+
+    def test_narrow(self):
+        with FakeTerminal(yx=(3, 10)):
+            self.assertEqual(calibrate(), (1,) * len(_GROUPS))
+            self.assertEqual(getyx(), (3, 10))
+        self.assertEqual(wcwidth(u'\u03b1'), 1)
+
+    def test_wide(self):
+        with FakeTerminal(yx=(3, 10), ambiguouswidth=2):
+            self.assertEqual(calibrate(), (2,) * len(_GROUPS))
+        self.assertEqual(wcwidth(u'\u03b1'), 2)
+        self.assertEqual(wcwidth(u'\u2500'), 2)
+        self.assertEqual(wcwidth(u'\u00a7'), 2)
+        self.assertEqual(wcswidth(u'\u03b1\u03b2'), 4)
+        self.assertEqual(wcwidth(u'\ufffd'), 2)
+        self.assertEqual(wcwidth(u'\u4e2d'), 2)
+        self.assertEqual(wcwidth(u'a'), 1)
+
+    def test_groups(self):
+        _setambiguous((1, 2, 1, 1, 1, 1, 1, 1))
+        self.assertEqual(wcwidth(u'\u03b1'), 2)
+        self.assertEqual(wcwidth(u'\u2500'), 1)
+        self.assertEqual(wcwidth(u'\ufffd'), 1)
+
+    def test_no_reply(self):
+        with FakeTerminal(silent=['yx', 'da1']):
+            self.assertEqual(calibrate(), None)
+
+    def test_cache(self):
+        enablecache()
+        with FakeTerminal(ambiguouswidth=2) as ft:
+            with Terminal() as t:
+                calibrate(t)
+                queries = ft.queries
+                self.assertEqual(calibrate(t), (2,) * len(_GROUPS))
+                self.assertEqual(ft.queries, queries)